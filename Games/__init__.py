@@ -0,0 +1,138 @@
+# coding=utf-8
+"""
+Games
+"""
+import random
+
+X = 'X'
+O = 'O'
+PLAYERS = (X, O)
+OPPONENT = {X: O, O: X}
+MASK64 = (1 << 64) - 1
+
+
+def to_move(cells):
+    """
+    Return the player whose turn it is.
+
+    :param cells: board cells holding 'X', 'O' or None
+    :return: 'X' or 'O'
+    """
+    return X if cells.count(X) == cells.count(O) else O
+
+
+def zobrist_keys(size, seed=0x5EED):
+    """
+    Return one pair of 64-bit keys per cell.
+
+    The keys are derived from a fixed seed, so every process that builds them
+    for the same board size gets the same hashes.
+
+    :param size: number of cells on the board
+    :param seed: seed of the key generator
+    :return: list of {player: key} dictionaries
+    """
+    generator = random.Random(seed * 1000003 + size)
+    return [{X: generator.getrandbits(64), O: generator.getrandbits(64)} for _ in range(size)]
+
+
+def position_hash(cells, keys):
+    """
+    Return the 64-bit hash of a position.
+
+    :param cells: board cells holding 'X', 'O' or None
+    :param keys: table returned by zobrist_keys
+    :return: int
+    """
+    value = 0
+    for index, cell in enumerate(cells):
+        if cell is not None:
+            value ^= keys[index][cell]
+    return value
+
+
+def encode(cells):
+    """
+    Return the base-3 encoding of a position: 0 for empty, 1 for X and 2 for O, first cell lowest.
+
+    :param cells: board cells holding 'X', 'O' or None
+    :return: int
+    """
+    code = 0
+    for cell in reversed(cells):
+        code = code * 3 + (0 if cell is None else 1 if cell == X else 2)
+    return code
+
+
+def decode(code, size):
+    """
+    Inverse of encode.
+
+    :param code: base-3 encoding
+    :param size: number of cells
+    :return: list of cells
+    """
+    cells = []
+    for _ in range(size):
+        code, digit = divmod(code, 3)
+        cells.append((None, X, O)[digit])
+    return cells
+
+
+def symmetries(width, height):
+    """
+    Return the symmetries of a board as index permutations.
+
+    A permutation p maps a position to the one whose cell i holds cell p[i]
+    of the original. Square boards have eight symmetries, others four.
+
+    :param width: cells per row
+    :param height: rows
+    :return: list of lists
+    """
+    def index(column, row):
+        return row * width + column
+
+    maps = [
+        lambda c, r: (c, r),
+        lambda c, r: (width - 1 - c, r),
+        lambda c, r: (c, height - 1 - r),
+        lambda c, r: (width - 1 - c, height - 1 - r),
+    ]
+    if width == height:
+        maps += [
+            lambda c, r: (r, c),
+            lambda c, r: (width - 1 - r, c),
+            lambda c, r: (r, height - 1 - c),
+            lambda c, r: (width - 1 - r, height - 1 - c),
+        ]
+    return [[index(*transform(i % width, i // width)) for i in range(width * height)] for transform in maps]
+
+
+def shape(game):
+    """
+    Return (width, height) of a game's board.
+
+    :param game: TicTacToe or MNKGame
+    :return: tuple
+    """
+    if hasattr(game, 'm'):
+        return game.m, game.n
+    side = int(len(game.board) ** 0.5)
+    return side, side
+
+
+def canonical(cells, permutations):
+    """
+    Return the smallest encoding of a position over its symmetries.
+
+    :param cells: board cells
+    :param permutations: list returned by symmetries
+    :return: (code, permutation that produced it)
+    """
+    best = None
+    for permutation in permutations:
+        code = encode([cells[i] for i in permutation])
+        if best is None or code < best[0]:
+            best = (code, permutation)
+    return best
@@ -0,0 +1,168 @@
+# coding=utf-8
+"""
+Blunder analysis
+"""
+import numpy as np
+
+from Games.retrograde import ILLEGAL
+from sandbox import MNKGame
+
+# One game per record: the ids of the X and O players, then the cells
+# played in order, padded with END.
+END = 0xFF
+RECORD = np.dtype([('x', '<u4'), ('o', '<u4'), ('moves', 'u1', (9,))])
+CHUNK = 1 << 16
+
+
+def pack_games(games, size=9):
+    """
+    Return games as an array of records.
+
+    :param games: iterable of (x player id, o player id, list of moves)
+    :param size: cells per board
+    :return: NumPy array of dtype RECORD, or its equivalent for size cells
+    """
+    dtype = record_type(size)
+    games = list(games)
+    records = np.zeros(len(games), dtype=dtype)
+    records['moves'] = END
+    for index, (x, o, moves) in enumerate(games):
+        records[index]['x'] = x
+        records[index]['o'] = o
+        records[index]['moves'][:len(moves)] = moves
+    return records
+
+
+def record_type(size):
+    """
+    Return the record dtype of a board with a given number of cells.
+    """
+    return RECORD if size == 9 else np.dtype([('x', '<u4'), ('o', '<u4'), ('moves', 'u1', (size,))])
+
+
+def write_archive(path, games, size=9):
+    """
+    Write games to a file that BlunderAnalyzer.analyze can map into memory.
+    """
+    pack_games(games, size).tofile(path)
+
+
+class BlunderAnalyzer:
+    """
+    Find the moves of archived games that worsen the solved outcome.
+
+    Records are replayed a chunk at a time, every ply of the whole chunk at
+    once: the value of each position and of the position after the move
+    are read from a Games.retrograde.EndgameTable, and a move is a blunder
+    when it turns a won position into a drawn or lost one, or a drawn one
+    into a lost one. Moves and blunders are counted per player id, in
+    arrays that grow with the largest id seen, so the accuracy of every
+    player is available after each chunk. Records that play an occupied
+    cell or continue after a win are counted as invalid and ignored from
+    that move on.
+    """
+
+    def __init__(self, table):
+        """
+
+        :param table: EndgameTable of the archive's board
+        """
+        self.table = table
+        self.size = table.size
+        self.powers = 3 ** np.arange(self.size, dtype=np.int64)
+        self.lines = np.array(MNKGame(table.m, table.n, table.k).winning_combos)
+        self.games = 0
+        self.invalid = 0
+        self.moves = np.zeros(0, dtype=np.int64)
+        self.blunders = np.zeros(0, dtype=np.int64)
+
+    def count(self, counts, players):
+        """
+        Add one to counts for every player id, growing the array as needed.
+
+        :return: the counts array, possibly a new one
+        """
+        if not len(players):
+            return counts
+        needed = int(players.max()) + 1
+        if needed > len(counts):
+            counts = np.concatenate([counts, np.zeros(max(needed, 2 * len(counts)) - len(counts), dtype=np.int64)])
+        counts += np.bincount(players, minlength=len(counts))
+        return counts
+
+    def feed(self, records):
+        """
+        Analyze a chunk of records.
+
+        :param records: array of RECORD, possibly a slice of a memory map
+        """
+        moves = np.asarray(records['moves']).astype(np.int64)
+        players = (np.asarray(records['x']).astype(np.int64), np.asarray(records['o']).astype(np.int64))
+        codes = np.zeros(len(records), dtype=np.int64)
+        playing = np.ones(len(records), dtype=bool)
+        invalid = np.zeros(len(records), dtype=bool)
+        for ply in range(self.size):
+            move = moves[:, ply]
+            playing &= move != END
+            if not playing.any():
+                break
+            outside = move >= self.size
+            cell = np.where(playing & ~outside, move, 0)
+            digit = 1 + ply % 2
+            value = self.table.values(codes)
+            occupied = (codes // self.powers[cell] % 3 != 0) | outside
+            following = codes + digit * self.powers[cell]
+            after = self.table.values(np.where(playing & ~occupied, following, 0))
+            bad = playing & (occupied | self.finished(codes) | (after == ILLEGAL))
+            invalid |= bad
+            playing &= ~bad
+            mover = players[ply % 2][playing]
+            self.moves = self.count(self.moves, mover)
+            self.blunders = self.count(self.blunders, players[ply % 2][playing & (4 - after < value)])
+            codes = np.where(playing, following, codes)
+        self.games += len(records)
+        self.invalid += int(invalid.sum())
+
+    def finished(self, codes):
+        """
+        Return which positions already have a line.
+        """
+        digits = codes[:, None] // self.powers % 3
+        result = np.zeros(len(codes), dtype=bool)
+        for value in (1, 2):
+            result |= (digits[:, self.lines] == value).all(axis=2).any(axis=1)
+        return result
+
+    def analyze(self, path, chunk=CHUNK):
+        """
+        Analyze an archive file written by write_archive, a chunk at a time from a memory map.
+
+        :param path: archive file
+        :param chunk: records per chunk
+        """
+        records = np.memmap(path, dtype=record_type(self.size), mode='r')
+        for start in range(0, len(records), chunk):
+            self.feed(records[start:start + chunk])
+
+    def accuracy(self, player):
+        """
+        Return the fraction of a player's moves that kept the solved outcome, None if it has none.
+        """
+        if player >= len(self.moves) or not self.moves[player]:
+            return None
+        return 1.0 - float(self.blunders[player]) / float(self.moves[player])
+
+    def report(self):
+        """
+        Return the totals and the accuracy of every player with moves.
+
+        :return: dict
+        """
+        players = np.flatnonzero(self.moves)
+        return {
+            'games': self.games,
+            'invalid': self.invalid,
+            'moves': int(self.moves.sum()),
+            'blunders': int(self.blunders.sum()),
+            'accuracy': {int(player): self.accuracy(player) for player in players},
+        }
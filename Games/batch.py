@@ -0,0 +1,235 @@
+# coding=utf-8
+"""
+Batched move evaluation
+"""
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+from queue import Empty, Queue
+from time import monotonic
+
+from Games import canonical, decode, shape, symmetries, to_move
+from Games.search import WIN, Search, distance
+from sandbox import MNKGame, TicTacToe
+
+Suggestion = namedtuple('Suggestion', 'move score')
+
+
+class SolvedTable:
+    """
+    Score and best move of every position reachable in a small game.
+
+    Positions are stored once per symmetry class, keyed by canonical
+    encoding, with the best move given in canonical orientation.
+    """
+
+    def __init__(self, game):
+        """
+
+        :param game: empty game to solve, e.g. sandbox.TicTacToe()
+        """
+        self.size = len(game.board)
+        self.board = shape(game) + (len(game.winning_combos[0]),)
+        self.permutations = symmetries(*shape(game))
+        self.entries = {}
+        self.solve(game)
+
+    def solve(self, game):
+        """
+        Fill the table below the game's position.
+
+        :return: score for the side to move
+        """
+        code, permutation = canonical(game.board, self.permutations)
+        entry = self.entries.get(code)
+        if entry is not None:
+            return entry.score
+        player = to_move(game.board)
+        best_score, best_move = -WIN - 1, None
+        for move in game.legal_moves():
+            game.make_move(move, player)
+            if game.has_winner():
+                score = WIN
+                self.entries.setdefault(canonical(game.board, self.permutations)[0], Suggestion(None, -WIN))
+            else:
+                score = distance(-self.solve(game))
+            game.undo_move(move)
+            if score > best_score:
+                best_score, best_move = score, move
+        if best_move is None:
+            best_score = 0
+        else:
+            best_move = permutation.index(best_move)
+        self.entries[code] = Suggestion(best_move, best_score)
+        return best_score
+
+
+def search_positions(positions, size, board=(3, 3, 3), depth=None):
+    """
+    Default evaluator for positions missing from the solved table.
+
+    :param positions: canonical encodings
+    :param size: cells per board
+    :param board: (m, n, k) of the game the positions belong to
+    :param depth: plies to search, all remaining moves by default
+    :return: list of Suggestion in canonical orientation
+    """
+    suggestions = []
+    game = MNKGame(*board)
+    for code in positions:
+        game.board = decode(code, size)
+        score, move = Search(game).solve(depth)
+        suggestions.append(Suggestion(move, score if move is not None else 0))
+    return suggestions
+
+
+class BatchEvaluator:
+    """
+    Suggest moves for many positions at once.
+
+    Positions are deduplicated by canonical encoding, so each symmetry class
+    in a batch is answered once. Answers come from the solved table, and
+    whatever it misses goes to the fallback evaluator in a single call.
+    """
+
+    def __init__(self, table=None, fallback=search_positions):
+        """
+
+        :param table: SolvedTable, a solved sandbox.TicTacToe by default
+        :param fallback: called with (canonical encodings, cells per board, (m, n, k)), returns Suggestions
+        """
+        if table is None:
+            table = SolvedTable(TicTacToe())
+        self.table = table
+        self.fallback = fallback
+
+    def evaluate(self, positions):
+        """
+
+        :param positions: games or lists of cells, all of the table's size
+        :return: list of Suggestion, one per position
+        """
+        table = self.table
+        keys = []
+        answers = {}
+        missing = []
+        for position in positions:
+            cells = getattr(position, 'board', position)
+            if len(cells) != table.size:
+                raise ValueError('expected %d cells, got %d' % (table.size, len(cells)))
+            code, permutation = canonical(cells, table.permutations)
+            keys.append((code, permutation))
+            if code not in answers:
+                entry = table.entries.get(code)
+                answers[code] = entry
+                if entry is None:
+                    missing.append(code)
+        if missing:
+            for code, suggestion in zip(missing, self.fallback(missing, table.size, table.board)):
+                answers[code] = suggestion
+        suggestions = []
+        for code, permutation in keys:
+            move, score = answers[code]
+            suggestions.append(Suggestion(None if move is None else permutation[move], score))
+        return suggestions
+
+
+class Coalescer:
+    """
+    Gather concurrent requests into micro-batches for a BatchEvaluator.
+
+    A worker thread takes the first waiting request, waits up to window
+    seconds for more, up to max_batch in total, and evaluates them together.
+    """
+
+    def __init__(self, evaluator=None, window=0.002, max_batch=1024):
+        """
+
+        :param evaluator: BatchEvaluator, a default one if omitted
+        :param window: seconds to wait for a batch to fill
+        :param max_batch: requests per batch at most
+        """
+        self.evaluator = evaluator if evaluator is not None else BatchEvaluator()
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = Queue()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.batches = 0
+        self.requests = 0
+        self.thread = threading.Thread(target=self.run, name='coalescer', daemon=True)
+        self.thread.start()
+
+    def submit(self, position):
+        """
+
+        :param position: game or list of cells
+        :return: Future resolving to a Suggestion
+        :raises RuntimeError: if the coalescer has been closed
+        """
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError('cannot submit to a closed Coalescer')
+            self.queue.put((list(getattr(position, 'board', position)), future))
+        return future
+
+    def suggest(self, position, timeout=None):
+        """
+        Submit a position and wait for its answer.
+
+        :return: Suggestion
+        """
+        return self.submit(position).result(timeout)
+
+    def run(self):
+        """
+        Body of the worker thread.
+        """
+        queue = self.queue
+        while True:
+            request = queue.get()
+            if request is None:
+                return
+            batch = [request]
+            closing = False
+            deadline = monotonic() + self.window
+            try:
+                while len(batch) < self.max_batch:
+                    request = queue.get(timeout=max(deadline - monotonic(), 0))
+                    if request is None:
+                        closing = True
+                        break
+                    batch.append(request)
+            except Empty:
+                pass
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                suggestions = self.evaluator.evaluate([cells for cells, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+            else:
+                for (_, future), suggestion in zip(batch, suggestions):
+                    future.set_result(suggestion)
+            if closing:
+                return
+
+    def close(self):
+        """
+        Answer the requests already submitted, then stop the worker thread.
+
+        Later submits raise RuntimeError.
+        """
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self.queue.put(None)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
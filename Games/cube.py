@@ -0,0 +1,188 @@
+# coding=utf-8
+"""
+3D tic-tac-toe
+"""
+from Games import O, OPPONENT, X
+from Games.render import Renderer
+from Games.search import WIN_BOUND
+
+SIDE = 4
+SIZE = SIDE ** 3
+
+
+def winning_lines(side=SIDE):
+    """
+    Return every straight line of side cells in a cube, cell index being z * side * side + y * side + x.
+
+    :return: list of lists, 76 of them for a side of 4
+    """
+    directions = [(dx, dy, dz) for dz in (-1, 0, 1) for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                  if (dz, dy, dx) > (0, 0, 0)]
+    found = []
+    for z in range(side):
+        for y in range(side):
+            for x in range(side):
+                for dx, dy, dz in directions:
+                    end = [x + dx * (side - 1), y + dy * (side - 1), z + dz * (side - 1)]
+                    if all(0 <= value < side for value in end):
+                        found.append([(z + dz * i) * side * side + (y + dy * i) * side + x + dx * i
+                                      for i in range(side)])
+    return found
+
+
+LINES = winning_lines()
+MASKS = [sum(1 << cell for cell in line) for line in LINES]
+# Indexes into LINES of the lines through each cell: 7 for corners and the
+# central cells, 4 for the others.
+THROUGH = [[number for number, line in enumerate(LINES) if cell in line] for cell in range(SIZE)]
+# Cells on more lines first, which makes alpha-beta cut off sooner.
+ORDER = sorted(range(SIZE), key=lambda cell: -len(THROUGH[cell]))
+# Contribution of a line to X's score, by [X stones][O stones]: 4 ** stones
+# for a line held by one side, nothing for an empty or blocked line.
+WEIGHTS = [[(1 << 2 * x if x else 0) if not o else (-(1 << 2 * o) if not x else 0) for o in range(SIDE + 1)]
+           for x in range(SIDE + 1)]
+
+
+class Cube:
+    """
+    4x4x4 tic-tac-toe on bitboards, with the interface of sandbox.TicTacToe.
+
+    The board list is kept for compatibility; moves are also recorded in
+    one 64-bit mask per player and in per-line stone counts. Only the lines
+    through the last move are checked for a win, and the score of the open
+    lines and the number of threats (lines one stone from complete and not
+    blocked) are updated on every move instead of being recomputed. The
+    board must only be changed through make_move, undo_move and load.
+    """
+
+    def __init__(self):
+        self.board = [None] * SIZE
+        self.winning_combos = LINES
+        self.bits = {X: 0, O: 0}
+        self.counts = {X: [0] * len(LINES), O: [0] * len(LINES)}
+        self.threats = {X: 0, O: 0}
+        self.score = 0
+        self.history = []
+
+    def draw(self, renderer=None):
+        """
+        Draw the four layers side by side.
+
+        :param renderer: Games.render.Renderer 16 cells wide and 4 high
+        """
+        if renderer is None:
+            renderer = Renderer(SIDE * SIDE, SIDE)
+        renderer.draw([self.board[z * SIDE * SIDE + y * SIDE + x]
+                       for y in range(SIDE) for z in range(SIDE) for x in range(SIDE)])
+
+    def legal_moves(self):
+        """
+        Return a list of legal moves, most connected cells first.
+        """
+        occupied = self.bits[X] | self.bits[O]
+        return [cell for cell in ORDER if not occupied >> cell & 1]
+
+    def make_move(self, position, player):
+        """
+        Make a move on the board.
+        """
+        self.board[position] = player
+        self.bits[player] |= 1 << position
+        self.history.append(position)
+        own, theirs = self.counts[player], self.counts[OPPONENT[player]]
+        x = player == X
+        for line in THROUGH[position]:
+            before, other = own[line], theirs[line]
+            own[line] = before + 1
+            if x:
+                self.score += WEIGHTS[before + 1][other] - WEIGHTS[before][other]
+            else:
+                self.score += WEIGHTS[other][before + 1] - WEIGHTS[other][before]
+            if not other:
+                if before == SIDE - 2:
+                    self.threats[player] += 1
+                elif before == SIDE - 1:
+                    self.threats[player] -= 1
+            elif before == 0 and other == SIDE - 1:
+                self.threats[OPPONENT[player]] -= 1
+
+    def undo_move(self, position):
+        """
+        Take back a move on the board.
+        """
+        player = self.board[position]
+        self.board[position] = None
+        self.bits[player] &= ~(1 << position)
+        self.history.remove(position)
+        own, theirs = self.counts[player], self.counts[OPPONENT[player]]
+        x = player == X
+        for line in THROUGH[position]:
+            after, other = own[line], theirs[line]
+            own[line] = after - 1
+            if x:
+                self.score += WEIGHTS[after - 1][other] - WEIGHTS[after][other]
+            else:
+                self.score += WEIGHTS[other][after - 1] - WEIGHTS[other][after]
+            if not other:
+                if after == SIDE - 1:
+                    self.threats[player] -= 1
+                elif after == SIDE:
+                    self.threats[player] += 1
+            elif after == 1 and other == SIDE - 1:
+                self.threats[OPPONENT[player]] += 1
+
+    def load(self, cells):
+        """
+        Replace the board with a position.
+
+        :param cells: 64 cells holding 'X', 'O' or None
+        """
+        self.__init__()
+        for position, cell in enumerate(cells):
+            if cell is not None:
+                self.make_move(position, cell)
+
+    def has_winner(self):
+        """
+        Return whether the last move completed a line.
+        """
+        if not self.history:
+            return False
+        position = self.history[-1]
+        bits = self.bits[self.board[position]]
+        for line in THROUGH[position]:
+            if bits & MASKS[line] == MASKS[line]:
+                return True
+        return False
+
+    def game_over(self):
+        """
+        Return whether or not the game is over.
+        """
+        return self.has_winner() or not self.legal_moves()
+
+
+def threats(game, player):
+    """
+    Evaluate a Cube position for Games.search.Search from its incremental counts.
+
+    A side to move with a threat wins on its next move, and one facing
+    threats on two different cells loses; otherwise the open-line score of
+    Games.search.lines is used, empty lines aside.
+
+    :param game: Cube
+    :param player: side to move
+    :return: int
+    """
+    opponent = OPPONENT[player]
+    if game.threats[player]:
+        return WIN_BOUND - 1
+    if game.threats[opponent] > 1:
+        occupied = game.bits[X] | game.bits[O]
+        counts, blocking = game.counts[opponent], game.counts[player]
+        cells = {MASKS[line] & ~occupied for line in range(len(LINES))
+                 if counts[line] == SIDE - 1 and not blocking[line]}
+        if len(cells) > 1:
+            return 1 - WIN_BOUND
+    score = game.score if player == X else -game.score
+    return max(2 - WIN_BOUND, min(WIN_BOUND - 2, score))
@@ -0,0 +1,274 @@
+# coding=utf-8
+"""
+Game-tree enumeration
+"""
+import json
+import os
+from multiprocessing import Pool
+
+from Games import shape, symmetries
+
+FIELDS = ('positions', 'wins', 'losses', 'draws')
+
+
+def line_masks(game):
+    """
+    Return, for every cell, the bit masks of the winning lines through it.
+
+    :param game: TicTacToe or MNKGame
+    :return: list of lists of ints
+    """
+    through = [[] for _ in game.board]
+    for combo in game.winning_combos:
+        mask = 0
+        for index in combo:
+            mask |= 1 << index
+        for index in combo:
+            through[index].append(mask)
+    return through
+
+
+def add(total, vector, offset=0, weight=1):
+    """
+    Add a flat statistics vector into another, shifted by offset depths.
+
+    :param total: flat list of len(FIELDS) counts per depth, grown as needed
+    :param vector: flat list in the same layout
+    :param offset: depths to shift vector by
+    :param weight: multiplicity of vector
+    """
+    start = offset * len(FIELDS)
+    missing = start + len(vector) - len(total)
+    if missing > 0:
+        total.extend([0] * missing)
+    for index, value in enumerate(vector):
+        if value:
+            total[start + index] += value * weight
+
+
+class Walker:
+    """
+    Depth-first counter of a subtree, on bitboards.
+
+    Statistics come back as a flat list holding, for each depth below the
+    root, the number of positions, first-player wins, second-player wins and
+    draws. Results of positions met again through a transposition are
+    reused from a memo, which is emptied whenever it reaches its limit.
+    """
+
+    def __init__(self, through, limit=1 << 20):
+        """
+
+        :param through: result of line_masks
+        :param limit: memo entries kept at most
+        """
+        self.through = through
+        self.size = len(through)
+        self.full = (1 << self.size) - 1
+        self.limit = limit
+        self.memo = {}
+
+    def walk(self, mover, waiting, first):
+        """
+
+        :param mover: bits of the side to move
+        :param waiting: bits of the other side
+        :param first: whether the side to move is the first player
+        :return: flat statistics list, depth 0 being this position
+        """
+        key = (mover, waiting)
+        found = self.memo.get(key)
+        if found is not None:
+            return found
+        total = [1, 0, 0, 0]
+        occupied = mover | waiting
+        win = [0, 0, 0, 0, 1, 1, 0, 0] if first else [0, 0, 0, 0, 1, 0, 1, 0]
+        draw = [0, 0, 0, 0, 1, 0, 0, 1]
+        through = self.through
+        for cell in range(self.size):
+            bit = 1 << cell
+            if occupied & bit:
+                continue
+            placed = mover | bit
+            for mask in through[cell]:
+                if placed & mask == mask:
+                    add(total, win)
+                    break
+            else:
+                if occupied | bit == self.full:
+                    add(total, draw)
+                else:
+                    add(total, self.walk(waiting, placed, not first), 1)
+        if len(self.memo) >= self.limit:
+            self.memo.clear()
+        self.memo[key] = total
+        return total
+
+
+def canonical_bits(x, o, permutations):
+    """
+    Return the smallest (x, o) pair over the board symmetries.
+    """
+    best = None
+    for permutation in permutations:
+        px = po = 0
+        for index, source in enumerate(permutation):
+            if x >> source & 1:
+                px |= 1 << index
+            elif o >> source & 1:
+                po |= 1 << index
+        if best is None or (px, po) < best:
+            best = (px, po)
+    return best
+
+
+def split(game, depth):
+    """
+    Walk the top of the tree and collect the positions at the split depth.
+
+    Positions equal up to symmetry are merged, with a weight counting how
+    many move sequences lead to any of them.
+
+    :param game: empty game
+    :param depth: plies to walk before splitting
+    :return: (flat statistics above the split, {(x, o): weight})
+    """
+    through = line_masks(game)
+    size = len(game.board)
+    full = (1 << size) - 1
+    permutations = symmetries(*shape(game))
+    top = []
+    tasks = {}
+
+    def visit(x, o, ply):
+        if ply == depth:
+            key = canonical_bits(x, o, permutations)
+            tasks[key] = tasks.get(key, 0) + 1
+            return
+        add(top, [1, 0, 0, 0], ply)
+        first = ply % 2 == 0
+        mover = x if first else o
+        for cell in range(size):
+            bit = 1 << cell
+            if (x | o) & bit:
+                continue
+            placed = mover | bit
+            if any(placed & mask == mask for mask in through[cell]):
+                add(top, [1, 1, 0, 0] if first else [1, 0, 1, 0], ply + 1)
+            elif (x | o | bit) == full:
+                add(top, [1, 0, 0, 1], ply + 1)
+            elif first:
+                visit(placed, o, ply + 1)
+            else:
+                visit(x, placed, ply + 1)
+
+    visit(0, 0, 0)
+    return top, tasks
+
+
+def header(game, depth):
+    """
+    Return the first record of a checkpoint, which ties it to a board and split depth.
+    """
+    width, height = shape(game)
+    return {'board': [width, height, len(game.winning_combos[0])], 'depth': depth}
+
+
+def load(path, game, depth):
+    """
+    Read the finished subtrees of a checkpoint.
+
+    Lines that cannot be decoded are skipped, and an unfinished last line,
+    left by a run that was killed while writing it, is cut off so that new
+    records start on a line of their own.
+
+    :return: {(x, o): flat statistics}
+    :raises ValueError: if the checkpoint was written for another board or depth
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as file:
+        lines = file.read().split(b'\n')
+        if lines[-1]:
+            file.truncate(file.tell() - len(lines[-1]))
+    lines = lines[:-1]
+    if lines:
+        try:
+            found = json.loads(lines[0])
+        except ValueError:
+            found = None
+        if found != header(game, depth):
+            raise ValueError('checkpoint %s is for %r, not %r' % (path, found, header(game, depth)))
+    for line in lines[1:]:
+        try:
+            record = json.loads(line)
+            done[tuple(record['key'])] = record['stats']
+        except (ValueError, KeyError, TypeError):
+            continue
+    return done
+
+
+_walker = None
+
+
+def _start(through, limit):
+    global _walker
+    _walker = Walker(through, limit)
+
+
+def _count(task):
+    x, o = task
+    first = bin(x).count('1') == bin(o).count('1')
+    return task, _walker.walk(x, o, True) if first else _walker.walk(o, x, False)
+
+
+def enumerate_games(game, depth=4, processes=None, checkpoint=None, limit=1 << 20, progress=None):
+    """
+    Count every game of a board, per depth, in parallel.
+
+    The tree is split after depth plies. The distinct positions there, up
+    to symmetry, are counted by worker processes and their results are
+    reduced as they arrive, weighted by how many sequences reach them; no
+    game is ever stored. With a checkpoint file every finished subtree is
+    appended to it, and a later run with the same file only counts the
+    subtrees still missing. The file starts with the board and depth it was
+    written for, and load refuses it for any other.
+
+    :param game: empty TicTacToe or MNKGame
+    :param depth: plies walked before fanning out
+    :param processes: number of workers, one per CPU by default
+    :param checkpoint: path of a file to record finished subtrees in
+    :param limit: memo entries kept by each worker
+    :param progress: called with (finished, total) after every subtree
+    :return: list of {'depth', 'positions', 'wins', 'losses', 'draws'}; wins are the first player's
+    :raises ValueError: if the checkpoint belongs to another board or depth
+    """
+    total, tasks = split(game, depth)
+    done = load(checkpoint, game, depth) if checkpoint is not None else {}
+    for key, stats in done.items():
+        if key in tasks:
+            add(total, stats, depth, tasks[key])
+    pending = [key for key in tasks if key not in done]
+    finished = len(tasks) - len(pending)
+    log = None
+    if checkpoint is not None:
+        log = open(checkpoint, 'a')
+        if not log.tell():
+            log.write(json.dumps(header(game, depth)) + '\n')
+    try:
+        with Pool(processes, _start, (line_masks(game), limit)) as pool:
+            for key, stats in pool.imap_unordered(_count, pending):
+                add(total, stats, depth, tasks[key])
+                finished += 1
+                if log is not None:
+                    log.write(json.dumps({'key': list(key), 'stats': stats}) + '\n')
+                    log.flush()
+                if progress is not None:
+                    progress(finished, len(tasks))
+    finally:
+        if log is not None:
+            log.close()
+    width = len(FIELDS)
+    return [dict(zip(('depth',) + FIELDS, [index // width] + total[index:index + width]))
+            for index in range(0, len(total), width)]
@@ -0,0 +1,107 @@
+# coding=utf-8
+"""
+k-in-a-row on an unbounded grid
+"""
+from Games import O, X
+
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+class InfiniteGame:
+    """
+    k-in-a-row on an unbounded grid, stored sparsely.
+
+    Positions are (x, y) tuples and stones a dict from position to player.
+    For every direction and player, the two ends of each run of stones
+    point at each other, so placing a stone joins the runs on either side
+    in constant time and has_winner only compares the lengths of the runs
+    through the last move. Candidate moves are the empty cells within
+    radius of a stone, counted as stones are placed and taken back. Memory
+    grows with the stones placed, never with the area they span.
+    """
+
+    def __init__(self, k=5, radius=2):
+        """
+
+        :param k: stones in a row needed to win
+        :param radius: distance from a stone within which cells are candidate moves
+        """
+        self.k = k
+        self.radius = radius
+        self.stones = {}
+        self.ends = {player: [{} for _ in DIRECTIONS] for player in (X, O)}
+        self.nearby = {}
+        self.history = []
+        self.offsets = [(dx, dy) for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1)
+                        if dx or dy]
+
+    def legal_moves(self):
+        """
+        Return the candidate moves: empty cells near a stone, or the origin on an empty board.
+        """
+        if not self.stones:
+            return [(0, 0)]
+        return list(self.nearby)
+
+    def make_move(self, position, player):
+        """
+        Make a move on the board.
+        """
+        x, y = position
+        self.stones[position] = player
+        changed = []
+        longest = 1
+        for ends, (dx, dy) in zip(self.ends[player], DIRECTIONS):
+            before = (x - dx, y - dy)
+            after = (x + dx, y + dy)
+            start = ends[before] if self.stones.get(before) == player else position
+            end = ends[after] if self.stones.get(after) == player else position
+            changed.append((ends, start, ends.get(start)))
+            changed.append((ends, end, ends.get(end)))
+            ends[start] = end
+            ends[end] = start
+            longest = max(longest, abs(end[0] - start[0]) + 1, abs(end[1] - start[1]) + 1)
+        self.history.append((position, changed, longest))
+        nearby = self.nearby
+        nearby.pop(position, None)
+        for dx, dy in self.offsets:
+            cell = (x + dx, y + dy)
+            if cell not in self.stones:
+                nearby[cell] = nearby.get(cell, 0) + 1
+
+    def undo_move(self, position):
+        """
+        Take back the last move.
+        """
+        position, changed, _ = self.history.pop()
+        for ends, cell, value in reversed(changed):
+            if value is None:
+                ends.pop(cell, None)
+            else:
+                ends[cell] = value
+        del self.stones[position]
+        x, y = position
+        nearby = self.nearby
+        count = 0
+        for dx, dy in self.offsets:
+            cell = (x + dx, y + dy)
+            if cell in self.stones:
+                count += 1
+            elif nearby[cell] == 1:
+                del nearby[cell]
+            else:
+                nearby[cell] -= 1
+        if count:
+            nearby[position] = count
+
+    def has_winner(self):
+        """
+        Return whether the last move made a row of k or more.
+        """
+        return bool(self.history) and self.history[-1][2] >= self.k
+
+    def game_over(self):
+        """
+        Return whether or not the game is over; the grid never fills up.
+        """
+        return self.has_winner()
@@ -0,0 +1,134 @@
+# coding=utf-8
+"""
+Tabular Q-learning
+"""
+import numpy as np
+
+from Games import encode
+from Games.retrograde import ILLEGAL
+from sandbox import TicTacToe
+
+
+class QTrainer:
+    """
+    Self-play Q-learning over a dense table indexed by base-3 encoding.
+
+    The table has one row per encoding and one column per cell, holding
+    the value of playing there for the side to move, so both sides share
+    it and a move is worth minus the best value of the position it leaves
+    to the opponent. A batch of games is played in lockstep: every step
+    picks all moves with one masked argmax, detects wins over all games at
+    once and updates the table with a single scatter, in which repeated
+    (position, move) pairs are averaged rather than applied several times.
+    """
+
+    def __init__(self, game=None, alpha=0.5, gamma=0.9, epsilon=0.5, batch=4096, seed=0):
+        """
+
+        :param game: empty TicTacToe or MNKGame, small enough for 3 ** cells rows; TicTacToe by default
+        :param alpha: learning rate
+        :param gamma: discount, so that quicker wins are worth more
+        :param epsilon: probability of a random move while training
+        :param batch: games played in lockstep
+        :param seed: seed of the move generator
+        """
+        game = game if game is not None else TicTacToe()
+        self.size = len(game.board)
+        self.lines = np.array(game.winning_combos)
+        self.powers = 3 ** np.arange(self.size, dtype=np.int64)
+        self.q = np.zeros((3 ** self.size, self.size), dtype=np.float32)
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.batch = batch
+        self.generator = np.random.default_rng(seed)
+        self.games = 0
+
+    def greedy(self, codes, legal):
+        """
+        Return the best legal move of each position and its value.
+        """
+        values = np.where(legal, self.q[codes], -np.inf)
+        moves = values.argmax(axis=1)
+        return moves, values[np.arange(len(codes)), moves]
+
+    def train(self, games):
+        """
+        Play and learn from a number of games, a batch at a time.
+
+        :param games: games to play, rounded up to a whole batch
+        """
+        for _ in range(0, games, self.batch):
+            self.play(self.batch)
+
+    def play(self, count):
+        """
+        Play one batch of games in lockstep, updating the table after every ply.
+        """
+        rows = np.arange(count)
+        boards = np.zeros((count, self.size), dtype=np.int8)
+        codes = np.zeros(count, dtype=np.int64)
+        playing = np.ones(count, dtype=bool)
+        for ply in range(self.size):
+            mover = 1 if ply % 2 == 0 else 2
+            legal = boards == 0
+            moves, _ = self.greedy(codes, legal)
+            explore = self.generator.random(count) < self.epsilon
+            random_moves = (self.generator.random((count, self.size)) * legal).argmax(axis=1)
+            moves = np.where(explore, random_moves, moves)
+            boards[rows, moves] = mover
+            following = codes + mover * self.powers[moves]
+            won = (boards[:, self.lines] == mover).all(axis=2).any(axis=1)
+            if ply == self.size - 1:
+                target = np.where(won, 1.0, 0.0)
+            else:
+                _, best = self.greedy(following, boards == 0)
+                target = np.where(won, 1.0, -self.gamma * best)
+            self.update(codes[playing], moves[playing], target[playing])
+            playing &= ~won
+            if not playing.any():
+                break
+            codes = following
+        self.games += count
+
+    def update(self, codes, moves, targets):
+        """
+        Move table entries toward their targets, averaging repeated entries.
+        """
+        flat = codes * self.size + moves
+        unique, inverse = np.unique(flat, return_inverse=True)
+        current = self.q.ravel()[unique]
+        total = np.bincount(inverse, weights=targets, minlength=len(unique))
+        count = np.bincount(inverse, minlength=len(unique))
+        self.q.ravel()[unique] = current + self.alpha * (total / count - current)
+
+    def move(self, cells):
+        """
+        Return the learned best move of a position.
+
+        :param cells: board cells holding 'X', 'O' or None
+        """
+        legal = np.array([[cell is None for cell in cells]])
+        moves, _ = self.greedy(np.array([encode(cells)]), legal)
+        return int(moves[0])
+
+    def agreement(self, table):
+        """
+        Return the fraction of unfinished positions in which the learned move keeps the solved value.
+
+        :param table: Games.retrograde.EndgameTable of the same board
+        :return: float
+        """
+        codes = np.arange(3 ** self.size, dtype=np.int64)
+        values = table.values(codes)
+        digits = codes[:, None] // self.powers % 3
+        legal = digits == 0
+        ended = np.zeros(len(codes), dtype=bool)
+        for value in (1, 2):
+            ended |= (digits[:, self.lines] == value).all(axis=2).any(axis=1)
+        pending = (values != ILLEGAL) & ~ended & legal.any(axis=1)
+        codes, legal, digits, values = codes[pending], legal[pending], digits[pending], values[pending]
+        mover = np.where((digits == 1).sum(axis=1) == (digits == 2).sum(axis=1), 1, 2)
+        moves, _ = self.greedy(codes, legal)
+        children = codes + mover * self.powers[moves]
+        return float((4 - table.values(children) == values).mean())
@@ -0,0 +1,122 @@
+# coding=utf-8
+"""
+Pondering
+"""
+import threading
+from copy import deepcopy
+from time import monotonic
+
+from Games import to_move
+from Games.search import Search, lines
+from Games.transposition import TranspositionTable
+
+
+class Ponderer:
+    """
+    Engine that keeps searching while the opponent thinks.
+
+    After the engine has played, ponder() starts a background search of the
+    position after the predicted reply, on a copy of the game. When think()
+    is called again and the opponent played the predicted move, that search
+    simply gets a deadline and its result is used; otherwise it is stopped
+    and the real position is searched with the table it has warmed up.
+    """
+
+    def __init__(self, game, table=None, evaluate=lines):
+        """
+
+        :param game: game the engine plays; moves are made on it by the caller
+        :param table: transposition table shared by every search
+        :param evaluate: scores a position at the depth limit
+        """
+        self.game = game
+        self.table = table if table is not None else TranspositionTable()
+        self.evaluate = evaluate
+        self.last = None
+        self.max_depth = None
+        self.search = None
+        self.thread = None
+        self.board = None
+        self.result = None
+        self.hits = 0
+        self.misses = 0
+
+    def think(self, deadline=None, budget=None, max_depth=None):
+        """
+        Return the engine's move for the current position of the game.
+
+        :param deadline: time.monotonic() value to stop at
+        :param budget: seconds to think, instead of a deadline
+        :param max_depth: deepest iteration
+        :return: Result
+        """
+        if budget is not None:
+            deadline = monotonic() + budget
+        if self.thread is not None and self.board == self.game.board and self.max_depth == max_depth:
+            self.hits += 1
+            self.search.deadline = deadline
+            self.thread.join()
+            result = self.result
+            self.reset()
+        else:
+            if self.thread is not None:
+                self.misses += 1
+            self.stop()
+            result = Search(self.game, self.table, self.evaluate).best_move(deadline, max_depth=max_depth)
+        self.last = result
+        self.max_depth = max_depth
+        return result
+
+    def ponder(self, move=None):
+        """
+        Start searching the position after the opponent's expected reply.
+
+        The search goes as deep as the last think() was allowed to; a think()
+        with another max_depth treats it as a miss.
+
+        :param move: reply to expect, the second move of the last principal variation by default
+        :return: whether a search was started
+        """
+        self.stop()
+        board = self.game.board
+        if move is None:
+            pv = self.last.pv if self.last is not None else []
+            if len(pv) < 2 or board[pv[0]] is None:
+                return False
+            move = pv[1]
+        if board[move] is not None:
+            return False
+        game = deepcopy(self.game)
+        game.make_move(move, to_move(board))
+        if game.has_winner() or not game.legal_moves():
+            return False
+        self.board = list(game.board)
+        self.search = Search(game, self.table, self.evaluate)
+        self.search.start()
+        self.thread = threading.Thread(target=self.run, name='ponder', daemon=True)
+        self.thread.start()
+        return True
+
+    def run(self):
+        """
+        Body of the background thread.
+        """
+        self.result = self.search.best_move(max_depth=self.max_depth)
+
+    def stop(self):
+        """
+        Abort pondering, if any, and wait for the background search to unwind.
+        """
+        if self.thread is not None:
+            self.search.stop()
+            self.thread.join()
+            self.reset()
+
+    def reset(self):
+        """
+        Forget the finished background search.
+        """
+        self.search = None
+        self.thread = None
+        self.board = None
+        self.result = None
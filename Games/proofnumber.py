@@ -0,0 +1,268 @@
+# coding=utf-8
+"""
+Proof-number search
+"""
+from collections import namedtuple
+
+from Games import O, X, shape, to_move, zobrist_keys
+
+INFINITY = 1 << 40
+
+Proof = namedtuple('Proof', 'result move nodes')
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised inside a proof search when its node budget is spent.
+    """
+
+
+class ProofNumberSearch:
+    """
+    Depth-first proof-number search for a forced win of the side to move.
+
+    Moves are restricted to the threat space: the attacker only plays
+    moves that leave a line one stone short of k (fours, for k = 5), and
+    a side facing such a line can only block it. Because every defence of
+    a four is considered, these proofs are exact victories by continuous
+    fours. With threes enabled the attacker may also leave lines two stones
+    short, and the defender then only tries the empty cells of the
+    attacker's lines and its own fours, as threat-space search does; such
+    proofs hold for those defences only.
+
+    Proof and disproof numbers are kept in a table keyed by Zobrist hash.
+    When it holds limit entries, the half that took the least work to
+    solve is dropped.
+    """
+
+    def __init__(self, game, threes=False, limit=1 << 20):
+        """
+
+        :param game: TicTacToe or MNKGame whose position is to be proved
+        :param threes: whether the attacker may also play moves leaving a line two stones short
+        :param limit: table entries kept at most
+        """
+        width, height = shape(game)
+        self.size = width * height
+        self.threes = threes
+        self.limit = limit
+        self.lines = [tuple(combo) for combo in game.winning_combos]
+        self.k = len(self.lines[0])
+        self.through = [[] for _ in range(self.size)]
+        for number, line in enumerate(self.lines):
+            for cell in line:
+                self.through[cell].append(number)
+        self.keys = zobrist_keys(self.size)
+        self.board = list(game.board)
+        self.counts = {X: [0] * len(self.lines), O: [0] * len(self.lines)}
+        # Open lines of each side by stones missing: {player: {missing: set of line numbers}}.
+        self.open = {X: {}, O: {}}
+        self.key = 0
+        for number in range(len(self.lines)):
+            self.classify(number, True)
+        for cell, player in enumerate(self.board):
+            if player is not None:
+                self.place(cell, player)
+        self.attacker = to_move(self.board)
+        self.table = {}
+        self.nodes = 0
+        self.budget = INFINITY
+
+    def classify(self, number, add):
+        """
+        Add a line to, or remove it from, the open lines of the side that alone holds it.
+        """
+        for player, other in ((X, O), (O, X)):
+            if not self.counts[other][number]:
+                missing = self.k - self.counts[player][number]
+                lines = self.open[player].setdefault(missing, set())
+                if add:
+                    lines.add(number)
+                else:
+                    lines.discard(number)
+
+    def place(self, cell, player):
+        """
+        Put a stone on the board, keeping line counts and the hash up to date.
+        """
+        for number in self.through[cell]:
+            self.classify(number, False)
+        self.board[cell] = player
+        self.key ^= self.keys[cell][player]
+        for number in self.through[cell]:
+            self.counts[player][number] += 1
+            self.classify(number, True)
+
+    def remove(self, cell):
+        """
+        Inverse of place.
+        """
+        player = self.board[cell]
+        for number in self.through[cell]:
+            self.classify(number, False)
+        self.board[cell] = None
+        self.key ^= self.keys[cell][player]
+        for number in self.through[cell]:
+            self.counts[player][number] -= 1
+            self.classify(number, True)
+
+    def cells(self, player, missing):
+        """
+        Return the empty cells of a side's open lines that lack the given number of stones.
+        """
+        board = self.board
+        found = set()
+        for number in self.open[player].get(missing, ()):
+            for cell in self.lines[number]:
+                if board[cell] is None:
+                    found.add(cell)
+        return found
+
+    def expand(self, player):
+        """
+        Return the threat-space moves of the side to move, or the outcome when already decided.
+
+        :param player: side to move
+        :return: (outcome, moves): outcome is True when the attacker has
+            won, False when it has lost or has no threat left to play, and
+            None while moves remain
+        """
+        opponent = O if player == X else X
+        attacking = player == self.attacker
+        if self.cells(player, 1):
+            return attacking, []
+        blocks = self.cells(opponent, 1)
+        if len(blocks) > 1:
+            return not attacking, []
+        if blocks:
+            return None, sorted(blocks)
+        if attacking:
+            moves = self.cells(player, 2)
+            if self.threes:
+                moves |= self.cells(player, 3)
+        elif self.threes:
+            moves = self.cells(opponent, 2) | self.cells(player, 2)
+        else:
+            moves = set()
+        return (None, sorted(moves)) if moves else (False, [])
+
+    def prove(self, budget=1000000):
+        """
+        Try to prove that the side to move can force a win.
+
+        :param budget: nodes to expand at most
+        :return: Proof; result is True when proved, False when disproved
+            within the threat space and None when the budget ran out
+        """
+        self.nodes = 0
+        self.budget = budget
+        try:
+            proof, _ = self.search(self.attacker, INFINITY, INFINITY)
+        except BudgetExceeded:
+            return Proof(None, None, self.nodes)
+        if proof:
+            return Proof(False, None, self.nodes)
+        return Proof(True, self.winning_move(), self.nodes)
+
+    def winning_move(self):
+        """
+        Return a root move of a proved position: the cell completing a line
+        when the side to move has one, else a move whose position is proved.
+
+        The table may have dropped the proved child since the root was
+        solved, in which case the children are searched again, without a
+        budget, until one is proved.
+        """
+        outcome, moves = self.expand(self.attacker)
+        if outcome:
+            return min(self.cells(self.attacker, 1))
+        for move in moves:
+            entry = self.table.get(self.key ^ self.keys[move][self.attacker])
+            if entry is not None and entry[0] == 0:
+                return move
+        opponent = O if self.attacker == X else X
+        self.budget = INFINITY
+        for move in moves:
+            self.place(move, self.attacker)
+            try:
+                proof, _ = self.search(opponent, INFINITY, INFINITY)
+            finally:
+                self.remove(move)
+            if proof == 0:
+                return move
+        return None
+
+    def search(self, player, proof_limit, disproof_limit):
+        """
+        Search the current position until its numbers reach a limit.
+
+        Numbers are from the attacker's point of view, so a position with
+        the attacker to move is an OR node and the others AND nodes.
+
+        :param player: side to move
+        :param proof_limit: threshold of the proof number
+        :param disproof_limit: threshold of the disproof number
+        :return: (proof number, disproof number)
+        """
+        self.nodes += 1
+        if self.nodes > self.budget:
+            raise BudgetExceeded()
+        attacking = player == self.attacker
+        outcome, moves = self.expand(player)
+        if outcome is not None:
+            numbers = (0, INFINITY) if outcome else (INFINITY, 0)
+            self.store(self.key, numbers, 1)
+            return numbers
+        opponent = O if player == X else X
+        keys = self.keys
+        work = self.nodes
+        while True:
+            children = []
+            for move in moves:
+                entry = self.table.get(self.key ^ keys[move][player])
+                children.append((entry[0], entry[1]) if entry is not None else (1, 1))
+            if attacking:
+                proof = min(child[0] for child in children)
+                disproof = min(INFINITY, sum(child[1] for child in children))
+            else:
+                proof = min(INFINITY, sum(child[0] for child in children))
+                disproof = min(child[1] for child in children)
+            if proof >= proof_limit or disproof >= disproof_limit:
+                break
+            index = self.select(children, 0 if attacking else 1)
+            best = children[index]
+            second = min((child[0 if attacking else 1] for number, child in enumerate(children) if number != index),
+                         default=INFINITY)
+            if attacking:
+                limits = (min(proof_limit, second + 1), disproof_limit - disproof + best[1])
+            else:
+                limits = (proof_limit - proof + best[0], min(disproof_limit, second + 1))
+            self.place(moves[index], player)
+            try:
+                self.search(opponent, *limits)
+            finally:
+                self.remove(moves[index])
+        self.store(self.key, (proof, disproof), self.nodes - work + 1)
+        return proof, disproof
+
+    @staticmethod
+    def select(children, which):
+        """
+        Return the index of the child with the smallest number of one kind.
+        """
+        best = 0
+        for index, child in enumerate(children):
+            if child[which] < children[best][which]:
+                best = index
+        return best
+
+    def store(self, key, numbers, work):
+        """
+        Record a position's numbers, making room first if the table is full.
+        """
+        table = self.table
+        if len(table) >= self.limit and key not in table:
+            kept = sorted(table.items(), key=lambda item: item[1][2])[len(table) // 2:]
+            table.clear()
+            table.update(kept)
+        table[key] = (numbers[0], numbers[1], work)
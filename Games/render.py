@@ -0,0 +1,108 @@
+# coding=utf-8
+"""
+Board rendering
+"""
+from Utils import ENDC, FAIL, OKBLUE, System
+
+COLORS = {'X': OKBLUE, 'O': FAIL}
+
+
+class Renderer:
+    """
+    Draw a board with one write per frame.
+
+    The first frame is drawn in full. With diff enabled, later frames only
+    rewrite the cells that changed: the cursor is moved up into the last
+    frame, the cell is written and the cursor returns below the frame. This
+    relies on nothing else having been written since the previous frame;
+    call reset() to force a full frame.
+    """
+
+    def __init__(self, width=3, height=3, colors=None, diff=True, out=None):
+        """
+
+        :param width: cells per row
+        :param height: rows
+        :param colors: {player: escape code}, e.g. COLORS; plain when None
+        :param diff: whether to redraw only the changed cells after the first frame
+        :param out: stream object with print and flush, System.out by default
+        """
+        self.width = width
+        self.height = height
+        self.colors = colors or {}
+        self.diff = diff
+        self.out = out
+        self.lines = 4 * height - 1
+        self.previous = None
+        self.blank = '|'.join(['   '] * width).rstrip()
+        self.rule = '-' * (4 * width - 1)
+
+    def cell(self, value):
+        """
+        Return the text of one cell.
+        """
+        if value is None:
+            return ' '
+        color = self.colors.get(value)
+        return color + value + ENDC if color else value
+
+    def frame(self, cells):
+        """
+        Return a complete frame.
+
+        :param cells: board cells
+        :return: str
+        """
+        width = self.width
+        rows = []
+        for row in range(self.height):
+            values = cells[row * width:(row + 1) * width]
+            rows.append('\n'.join((self.blank, ' ' + ' | '.join(self.cell(value) for value in values), self.blank)))
+        return ('\n' + self.rule + '\n').join(rows) + '\n'
+
+    def update(self, cells):
+        """
+        Return the escape sequences that turn the previous frame into this one.
+
+        :param cells: board cells
+        :return: str
+        """
+        parts = []
+        for index, value in enumerate(cells):
+            if value != self.previous[index]:
+                row, column = divmod(index, self.width)
+                up = self.lines - 4 * row - 1
+                parts.append('\033[%dA\033[%dG%s\033[%dB\r' % (up, 4 * column + 2, self.cell(value), up))
+        return ''.join(parts)
+
+    def render(self, cells):
+        """
+        Return the text to write for this frame and remember the cells.
+
+        :param cells: board cells
+        :return: str
+        """
+        if self.diff and self.previous is not None and len(self.previous) == len(cells):
+            text = self.update(cells)
+        else:
+            text = self.frame(cells)
+        self.previous = list(cells)
+        return text
+
+    def draw(self, cells):
+        """
+        Write a frame in a single call.
+
+        :param cells: board cells
+        """
+        text = self.render(cells)
+        if text:
+            out = self.out or System.out
+            out.print(text, False)
+            out.flush()
+
+    def reset(self):
+        """
+        Draw the next frame in full.
+        """
+        self.previous = None
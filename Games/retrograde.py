@@ -0,0 +1,194 @@
+# coding=utf-8
+"""
+Retrograde endgame database
+"""
+import struct
+
+import numpy as np
+
+from Games import encode, to_move
+
+# Values for the side to move, two bits each.
+ILLEGAL = 0
+LOST = 1
+DRAWN = 2
+WON = 3
+MAGIC = b'TTTB'
+HEADER = struct.Struct('<4sHHHxxxxxx')
+# Encodings solved per pass; a multiple of 4, so that every block starts on a byte.
+BLOCK = 1 << 20
+
+
+class EndgameTable:
+    """
+    Value of every position of a k-in-a-row board, by base-3 encoding.
+
+    Each of the 3 ** cells encodings is a dense index into a NumPy array of
+    2-bit values, four per byte, so a lookup is one encoding and one array
+    read. Encodings that cannot occur in a game, such as those where both
+    sides have a line, hold ILLEGAL.
+    """
+
+    def __init__(self, data, m, n, k):
+        """
+
+        :param data: packed uint8 array, possibly memory-mapped
+        :param m: cells per row
+        :param n: rows
+        :param k: stones in a row needed to win
+        """
+        self.data = data
+        self.m = m
+        self.n = n
+        self.k = k
+        self.size = m * n
+
+    @classmethod
+    def build(cls, game):
+        """
+        Solve a game by backward induction over all of its encodings.
+
+        Adding a stone to a position always gives a larger encoding, so
+        blocks of encodings are solved from the top down and, inside a
+        block, positions with more stones first. Every pass looks up the
+        children of a whole set of positions at once in the packed table,
+        which is the only array of the whole table ever allocated; each
+        block is packed into it as soon as a pass has solved its part.
+
+        :param game: empty TicTacToe or MNKGame
+        :return: EndgameTable
+        """
+        size = len(game.board)
+        total = 3 ** size
+        powers = 3 ** np.arange(size, dtype=np.int64)
+        lines = [np.array(combo) for combo in game.winning_combos]
+        table = cls(np.zeros((total + 3) // 4, dtype=np.uint8), *dimensions(game))
+        for start in range((total - 1) // BLOCK * BLOCK, -1, -BLOCK):
+            codes = np.arange(start, min(start + BLOCK, total), dtype=np.int64)
+            digits = np.empty((size, len(codes)), dtype=np.int8)
+            for cell in range(size):
+                digits[cell] = codes // powers[cell] % 3
+            x_count = (digits == 1).sum(axis=0)
+            o_count = (digits == 2).sum(axis=0)
+            x_line = np.zeros(len(codes), dtype=bool)
+            o_line = np.zeros(len(codes), dtype=bool)
+            for line in lines:
+                x_line |= (digits[line] == 1).all(axis=0)
+                o_line |= (digits[line] == 2).all(axis=0)
+            x_moves = x_count == o_count
+            block = np.full(len(codes), ILLEGAL, dtype=np.uint8)
+            legal = (x_moves | (x_count == o_count + 1)) & ~(x_line & o_line)
+            # The side that just moved may have a line, never the side to move.
+            legal &= ~np.where(x_moves, x_line, o_line)
+            ended = legal & (x_line | o_line)
+            block[ended] = LOST
+            full = legal & ~ended & (x_count + o_count == size)
+            block[full] = DRAWN
+            pending = legal & ~ended & ~full
+            mover = np.where(x_moves, 1, 2).astype(np.int64)
+            stones = x_count + o_count
+            packed = table.data[start >> 2:(start + len(codes) + 3) >> 2]
+            packed[:] = pack(block)
+            for count in range(size - 1, -1, -1):
+                index = np.flatnonzero(pending & (stones == count))
+                if not len(index):
+                    continue
+                best = np.zeros(len(index), dtype=np.uint8)
+                for cell in range(size):
+                    empty = digits[cell, index] == 0
+                    chosen = index[empty]
+                    children = codes[chosen] + mover[chosen] * powers[cell]
+                    best[empty] = np.maximum(best[empty], 4 - table.values(children))
+                block[index] = best
+                packed[:] = pack(block)
+        return table
+
+    def save(self, path):
+        """
+        Write the table to a file that load can map into memory.
+        """
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, self.m, self.n, self.k))
+            file.write(np.ascontiguousarray(self.data).tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """
+        Map a table written by save; pages are only read when looked up.
+
+        :raises ValueError: if the file is not a table or is truncated
+        """
+        with open(path, 'rb') as file:
+            header = file.read(HEADER.size)
+        if len(header) < HEADER.size or header[:4] != MAGIC:
+            raise ValueError('not an endgame table: %s' % path)
+        _, m, n, k = HEADER.unpack(header)
+        length = (3 ** (m * n) + 3) // 4
+        try:
+            data = np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER.size, shape=(length,))
+        except ValueError:
+            raise ValueError('truncated endgame table: %s' % path)
+        return cls(data, m, n, k)
+
+    def lookup(self, index):
+        """
+        Return the value stored at an encoding.
+        """
+        return int(self.data[index >> 2]) >> ((index & 3) << 1) & 3
+
+    def values(self, indexes):
+        """
+        Return the values stored at an array of encodings.
+
+        :param indexes: int64 NumPy array
+        :return: uint8 array of the same shape
+        """
+        return self.data[indexes >> 2] >> ((indexes & 3) << 1).astype(np.uint8) & 3
+
+    def value(self, cells):
+        """
+        Return the value of a position for the side to move.
+
+        :param cells: board cells holding 'X', 'O' or None
+        :return: ILLEGAL, LOST, DRAWN or WON
+        """
+        return self.lookup(encode(cells))
+
+    def best_move(self, cells):
+        """
+        Return a move that keeps the best value for the side to move.
+
+        :param cells: board cells of a legal, unfinished position
+        :return: (move, value), move being None when there is none
+        """
+        code = encode(cells)
+        digit = 1 if to_move(cells) == 'X' else 2
+        best_move, best_value = None, ILLEGAL
+        power = 1
+        for move, cell in enumerate(cells):
+            if cell is None:
+                value = 4 - self.lookup(code + digit * power)
+                if value > best_value:
+                    best_move, best_value = move, value
+            power *= 3
+        return best_move, best_value
+
+
+def dimensions(game):
+    """
+    Return (m, n, k) of a square TicTacToe or an MNKGame.
+    """
+    if hasattr(game, 'm'):
+        return game.m, game.n, game.k
+    side = int(len(game.board) ** 0.5)
+    return side, side, len(game.winning_combos[0])
+
+
+def pack(values):
+    """
+    Pack an array of 2-bit values four to a byte, first value lowest.
+    """
+    padded = np.zeros((len(values) + 3) // 4 * 4, dtype=np.uint8)
+    padded[:len(values)] = values
+    quads = padded.reshape(-1, 4)
+    return quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6
@@ -0,0 +1,362 @@
+# coding=utf-8
+"""
+Search
+"""
+import threading
+from collections import namedtuple
+from multiprocessing import Pool
+from time import monotonic
+
+from Games import OPPONENT, position_hash, to_move, zobrist_keys
+from Games.transposition import EXACT, LOWER, UPPER, SharedTranspositionTable, TranspositionTable
+
+WIN = 10000
+WIN_BOUND = WIN - 1000
+CHECK_INTERVAL = 1024
+
+Result = namedtuple('Result', 'move score depth pv nodes')
+
+
+class Timeout(Exception):
+    """
+    Raised inside a search when its deadline has passed.
+    """
+
+
+def lines(game, player):
+    """
+    Score a position by its open lines.
+
+    A line held only by one side counts 4 ** stones for that side.
+
+    :param game: game with board and winning_combos
+    :param player: side to score for
+    :return: int
+    """
+    board = game.board
+    opponent = OPPONENT[player]
+    score = 0
+    for combo in game.winning_combos:
+        own = theirs = 0
+        for index in combo:
+            cell = board[index]
+            if cell == player:
+                own += 1
+            elif cell == opponent:
+                theirs += 1
+        if not theirs:
+            score += 1 << 2 * own
+        elif not own:
+            score -= 1 << 2 * theirs
+    return max(1 - WIN_BOUND, min(WIN_BOUND - 1, score))
+
+
+def distance(score):
+    """
+    Move a score one ply further from the position it was found in, so faster wins score higher.
+
+    :param score: score of a child position, from its parent's point of view
+    :return: int
+    """
+    if score > WIN_BOUND:
+        return score - 1
+    if score < -WIN_BOUND:
+        return score + 1
+    return score
+
+
+def undistance(score):
+    """
+    Inverse of distance, used to translate a search window to the child position.
+
+    :param score: bound from the parent's point of view
+    :return: int
+    """
+    if score > WIN_BOUND:
+        return score + 1
+    if score < -WIN_BOUND:
+        return score - 1
+    return score
+
+
+class Search:
+    """
+    Alpha-beta negamax over a TicTacToe-compatible game.
+
+    The game only needs board, legal_moves, make_move, undo_move and
+    has_winner. Scores are from the point of view of the side to move.
+    """
+
+    def __init__(self, game, table=None, evaluate=lines):
+        """
+
+        :param game: game to search; it is restored after every search
+        :param table: optional transposition table with probe and store
+        :param evaluate: scores a position at the depth limit, called with (game, player)
+        """
+        self.game = game
+        self.table = table
+        self.evaluate = evaluate
+        self.keys = zobrist_keys(len(game.board))
+        self.nodes = 0
+        self.deadline = None
+        self.stopped = False
+        self.running = False
+        self.lock = threading.Lock()
+        self.first = False
+        self.next_check = float('inf')
+
+    def solve(self, depth=None):
+        """
+        Search the current position.
+
+        :param depth: plies to search, all remaining moves by default
+        :return: (score, best move)
+        """
+        moves = self.game.legal_moves()
+        if depth is None:
+            depth = len(moves)
+        return self.root(moves, depth)
+
+    def root(self, moves, depth):
+        """
+        Search the given root moves in order.
+
+        :return: (score, best move)
+        """
+        player = to_move(self.game.board)
+        key = position_hash(self.game.board, self.keys)
+        best_score, best_move = -WIN - 1, None
+        alpha = -WIN - 1
+        for move in moves:
+            score = self.child(key, move, depth, alpha, WIN + 1, player)
+            if score > best_score:
+                best_score, best_move = score, move
+                alpha = max(alpha, score)
+        return best_score, best_move
+
+    def best_move(self, deadline=None, budget=None, max_depth=None):
+        """
+        Deepen iteratively until the deadline and return the best move of the deepest finished iteration.
+
+        The clock is only read every CHECK_INTERVAL nodes. The first
+        iteration always finishes, so a move is returned even when the
+        deadline has already passed or the search was stopped. The deadline
+        may be moved, and the search stopped, from another thread while it
+        runs; a stop only applies to the call it interrupts.
+
+        :param deadline: time.monotonic() value to stop at
+        :param budget: seconds to think, instead of a deadline
+        :param max_depth: deepest iteration, all remaining moves by default
+        :return: Result
+        """
+        if budget is not None:
+            deadline = monotonic() + budget
+        if self.table is None:
+            self.table = TranspositionTable()
+        if hasattr(self.table, 'new_search'):
+            self.table.new_search()
+        moves = self.game.legal_moves()
+        if max_depth is None:
+            max_depth = len(moves)
+        self.nodes = 0
+        if deadline is not None:
+            self.deadline = deadline
+        result = Result(moves[0] if moves else None, 0, 0, [], 0)
+        self.first = True
+        self.start()
+        try:
+            for depth in range(1, max_depth + 1):
+                try:
+                    score, move = self.root(moves, depth)
+                except Timeout:
+                    break
+                self.first = False
+                self.next_check = self.nodes
+                moves.remove(move)
+                moves.insert(0, move)
+                result = Result(move, score, depth, self.principal_variation(move, depth), self.nodes)
+                if abs(score) > WIN_BOUND:
+                    break
+        finally:
+            with self.lock:
+                self.running = False
+                self.stopped = False
+            self.deadline = None
+            self.first = False
+            self.next_check = float('inf')
+        return result._replace(nodes=self.nodes)
+
+    def check(self):
+        """
+        Raise Timeout when the search was stopped or its deadline has passed.
+
+        Nothing is raised during the first iteration of best_move.
+        """
+        if self.first:
+            self.next_check = self.nodes + CHECK_INTERVAL
+            return
+        if self.stopped or self.deadline is not None and monotonic() >= self.deadline:
+            raise Timeout()
+        self.next_check = self.nodes + CHECK_INTERVAL
+
+    def start(self):
+        """
+        Mark the search as running ahead of a best_move call made from another thread.
+
+        A stop arriving between this and the call then applies to the call.
+        """
+        with self.lock:
+            self.running = True
+
+    def stop(self):
+        """
+        Ask a running best_move to return the result of its last finished iteration.
+
+        Nothing happens when no call is running.
+        """
+        with self.lock:
+            if self.running:
+                self.stopped = True
+                self.next_check = 0
+
+    def principal_variation(self, move, depth):
+        """
+        Follow the best moves stored in the table from the root.
+
+        :param move: best root move
+        :param depth: plies to follow at most
+        :return: list of moves
+        """
+        game = self.game
+        player = to_move(game.board)
+        key = position_hash(game.board, self.keys)
+        played = []
+        while move is not None and len(played) < depth and game.board[move] is None:
+            game.make_move(move, player)
+            played.append(move)
+            key ^= self.keys[move][player]
+            player = OPPONENT[player]
+            if game.has_winner():
+                break
+            entry = self.table.probe(key)
+            move = entry.move if entry is not None else None
+        for move in reversed(played):
+            game.undo_move(move)
+        return played
+
+    def child(self, key, move, depth, alpha, beta, player):
+        """
+        Play a move, search the resulting position and take the move back.
+
+        :return: score of the move for player
+        """
+        game = self.game
+        game.make_move(move, player)
+        try:
+            if game.has_winner():
+                self.nodes += 1
+                return WIN
+            return distance(-self.negamax(key ^ self.keys[move][player], depth - 1,
+                                          -undistance(beta), -undistance(alpha), OPPONENT[player]))
+        finally:
+            game.undo_move(move)
+
+    def negamax(self, key, depth, alpha, beta, player):
+        """
+
+        :param key: hash of the current position
+        :param depth: remaining plies
+        :param alpha: lower bound
+        :param beta: upper bound
+        :param player: side to move
+        :return: score for player
+        """
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.check()
+        moves = self.game.legal_moves()
+        if not moves:
+            return 0
+        if depth <= 0:
+            return self.evaluate(self.game, player)
+        table = self.table
+        original = alpha
+        hint = None
+        if table is not None:
+            entry = table.probe(key)
+            if entry is not None:
+                if entry.depth >= depth:
+                    if entry.bound == EXACT:
+                        return entry.score
+                    if entry.bound == LOWER:
+                        alpha = max(alpha, entry.score)
+                    else:
+                        beta = min(beta, entry.score)
+                    if alpha >= beta:
+                        return entry.score
+                hint = entry.move
+        if hint in moves:
+            moves.remove(hint)
+            moves.insert(0, hint)
+        best_score, best_move = -WIN - 1, None
+        for move in moves:
+            score = self.child(key, move, depth, alpha, beta, player)
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        if table is not None:
+            if best_score <= original:
+                bound = UPPER
+            elif best_score >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            table.store(key, depth, bound, best_score, best_move)
+        return best_score
+
+
+_worker_table = None
+
+
+def _attach(table):
+    global _worker_table
+    _worker_table = table
+
+
+def _search_move(task):
+    game, move, depth = task
+    player = to_move(game.board)
+    search = Search(game, _worker_table)
+    key = position_hash(game.board, search.keys)
+    return move, search.child(key, move, depth, -WIN - 1, WIN + 1, player), search.nodes
+
+
+def parallel_solve(game, processes=None, depth=None, size=1 << 24):
+    """
+    Search every root move in its own worker process.
+
+    All workers share one SharedTranspositionTable, so a position solved by
+    one of them is a table hit for the others.
+
+    :param game: game to search
+    :param processes: number of workers, one per CPU by default
+    :param depth: plies to search, all remaining moves by default
+    :param size: size of the shared table in bytes
+    :return: (score, best move, nodes)
+    """
+    moves = game.legal_moves()
+    if depth is None:
+        depth = len(moves)
+    with SharedTranspositionTable(size) as table:
+        with Pool(processes, _attach, (table,)) as pool:
+            results = pool.map(_search_move, [(game, move, depth) for move in moves])
+    best_score, best_move, nodes = -WIN - 1, None, 0
+    for move, score, count in results:
+        nodes += count
+        if score > best_score:
+            best_score, best_move = score, move
+    return best_score, best_move, nodes
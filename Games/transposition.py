@@ -0,0 +1,328 @@
+# coding=utf-8
+"""
+Transposition tables
+"""
+import struct
+from array import array
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+from Games import MASK64
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+NO_MOVE = 0xFFFF
+MAX_DEPTH = 0xFF
+SCORE_OFFSET = 1 << 15
+VALID = 1 << 63
+
+ALWAYS = 'always'
+DEPTH = 'depth'
+TWO_TIER = 'two-tier'
+
+Entry = namedtuple('Entry', 'depth bound score move')
+
+
+def pack(depth, bound, score, move, generation=0):
+    """
+    Pack an entry into a single 64-bit word.
+
+    Layout, from the low bits: score (16, offset), move (16), depth (8),
+    bound (2), generation (8, at bit 48) and a valid flag at bit 63.
+
+    :param depth: remaining depth the score was searched to
+    :param bound: EXACT, LOWER or UPPER
+    :param score: score from the point of view of the side to move
+    :param move: best move, or None
+    :param generation: search generation the entry was written in
+    :return: int
+    """
+    if move is None:
+        move = NO_MOVE
+    return (VALID
+            | (generation & 0xFF) << 48
+            | (bound & 0x3) << 40
+            | min(depth, MAX_DEPTH) << 32
+            | (move & 0xFFFF) << 16
+            | (score + SCORE_OFFSET) & 0xFFFF)
+
+
+def unpack(data):
+    """
+    Unpack a word written by pack.
+
+    :param data: packed entry
+    :return: Entry
+    """
+    move = (data >> 16) & 0xFFFF
+    return Entry((data >> 32) & 0xFF,
+                 (data >> 40) & 0x3,
+                 (data & 0xFFFF) - SCORE_OFFSET,
+                 None if move == NO_MOVE else move)
+
+
+def generation_of(data):
+    """
+    Return the generation a packed entry was written in.
+
+    :param data: packed entry
+    :return: int
+    """
+    return (data >> 48) & 0xFF
+
+
+def keeps(data, depth, generation):
+    """
+    Return whether an occupied slot should survive a store of a shallower result.
+
+    :param data: packed entry currently in the slot
+    :param depth: depth of the entry being stored
+    :param generation: current generation
+    :return: bool
+    """
+    return bool(data & VALID) and generation_of(data) == generation and depth < (data >> 32) & 0xFF
+
+
+class TranspositionTable:
+    """
+    Transposition table with a hard byte budget.
+
+    Entries live in one preallocated array of 64-bit words, a key word and a
+    packed data word per slot, so the table never grows past its budget.
+
+    Replacement policies:
+    ALWAYS   -- every store overwrites its slot.
+    DEPTH    -- a slot keeps a deeper result from the current generation.
+    TWO_TIER -- slots are paired into buckets; the first keeps the deeper
+                result, the second takes everything the first refuses.
+    """
+    SLOT = 16
+
+    def __init__(self, size=1 << 20, policy=DEPTH):
+        """
+
+        :param size: size in bytes, rounded down to a power-of-two slot count
+        :param policy: ALWAYS, DEPTH or TWO_TIER
+        :raises ValueError: on an unknown policy, or a size below one slot (one two-slot bucket for TWO_TIER)
+        """
+        if policy not in (ALWAYS, DEPTH, TWO_TIER):
+            raise ValueError('unknown replacement policy: %r' % (policy,))
+        minimum = 2 if policy == TWO_TIER else 1
+        if size // self.SLOT < minimum:
+            raise ValueError('%d bytes is less than the %d of the smallest table' % (size, minimum * self.SLOT))
+        self.policy = policy
+        self.slots = 1 << (size // self.SLOT).bit_length() - 1
+        self.mask = (self.slots >> 1) - 1 if policy == TWO_TIER else self.slots - 1
+        self.words = array('Q', bytes(self.slots * self.SLOT))
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.used = 0
+
+    @property
+    def size(self):
+        """
+        Bytes held by the entries.
+        """
+        return self.words.itemsize * len(self.words)
+
+    def new_search(self):
+        """
+        Start a new generation so entries of earlier searches become replaceable.
+        """
+        self.generation = (self.generation + 1) & 0xFF
+
+    def probe(self, key):
+        """
+
+        :param key: 64-bit position hash
+        :return: Entry, or None on a miss
+        """
+        self.probes += 1
+        key &= MASK64
+        words = self.words
+        if self.policy == TWO_TIER:
+            first = (key & self.mask) << 2
+            indexes = (first, first + 2)
+        else:
+            indexes = ((key & self.mask) << 1,)
+        occupied = False
+        for index in indexes:
+            data = words[index + 1]
+            if data & VALID:
+                if words[index] == key:
+                    self.hits += 1
+                    return unpack(data)
+                occupied = True
+        if occupied:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, bound, score, move=None):
+        """
+
+        :param key: 64-bit position hash
+        :param depth: remaining depth the score was searched to
+        :param bound: EXACT, LOWER or UPPER
+        :param score: score from the point of view of the side to move
+        :param move: best move, or None
+        """
+        self.stores += 1
+        key &= MASK64
+        words = self.words
+        policy = self.policy
+        if policy == TWO_TIER:
+            index = (key & self.mask) << 2
+            if keeps(words[index + 1], depth, self.generation):
+                index += 2
+        else:
+            index = (key & self.mask) << 1
+            if policy == DEPTH and keeps(words[index + 1], depth, self.generation):
+                return
+        if not words[index + 1] & VALID:
+            self.used += 1
+        elif words[index] != key:
+            self.overwrites += 1
+        words[index] = key
+        words[index + 1] = pack(depth, bound, score, move, self.generation)
+
+    def clear(self):
+        """
+        Empty every slot and reset the counters.
+        """
+        self.words = array('Q', bytes(self.slots * self.SLOT))
+        self.probes = self.hits = self.collisions = self.stores = self.overwrites = self.used = 0
+
+    def stats(self):
+        """
+        Return the counters gathered since the table was created or cleared.
+
+        :return: dict
+        """
+        return {
+            'policy': self.policy,
+            'bytes': self.size,
+            'slots': self.slots,
+            'used': self.used,
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.probes if self.probes else 0.0,
+            'collisions': self.collisions,
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+        }
+
+
+class SharedTranspositionTable:
+    """
+    Fixed-size transposition table in shared memory.
+
+    Every slot holds two 64-bit words: the key xor-ed with the data, and the
+    data itself. Readers only accept a slot whose words xor back to the probed
+    key, so an entry torn by two processes writing at once reads as a miss and
+    no lock is needed.
+
+    An entry is replaced when the slot is empty, was written in an older
+    generation, or holds a result searched no deeper than the new one.
+    """
+    HEADER = struct.Struct('<QQ')
+    SLOT = struct.Struct('<QQ')
+
+    def __init__(self, size=1 << 20, name=None):
+        """
+
+        :param size: size in bytes, rounded down to a power-of-two slot count
+        :param name: name of an existing table to attach to instead of creating one
+        :raises ValueError: if size is below one slot
+        """
+        if name is None:
+            if size < self.SLOT.size:
+                raise ValueError('%d bytes cannot hold a slot of %d bytes' % (size, self.SLOT.size))
+            slots = 1 << (size // self.SLOT.size).bit_length() - 1
+            self.memory = shared_memory.SharedMemory(
+                create=True, size=self.HEADER.size + slots * self.SLOT.size)
+            self.HEADER.pack_into(self.memory.buf, 0, slots, 0)
+            self.owner = True
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.slots = self.HEADER.unpack_from(self.memory.buf, 0)[0]
+        self.mask = self.slots - 1
+
+    @property
+    def name(self):
+        """
+        Name other processes attach to.
+        """
+        return self.memory.name
+
+    @property
+    def generation(self):
+        """
+        Current search generation, shared by every attached process.
+        """
+        return self.HEADER.unpack_from(self.memory.buf, 0)[1]
+
+    def new_search(self):
+        """
+        Start a new generation so entries of earlier searches become replaceable.
+        """
+        self.HEADER.pack_into(self.memory.buf, 0, self.slots, (self.generation + 1) & 0xFF)
+
+    def probe(self, key):
+        """
+
+        :param key: 64-bit position hash
+        :return: Entry, or None on a miss
+        """
+        check, data = self.SLOT.unpack_from(self.memory.buf, self.HEADER.size + (key & self.mask) * self.SLOT.size)
+        if data & VALID and check ^ data == key & MASK64:
+            return unpack(data)
+        return None
+
+    def store(self, key, depth, bound, score, move=None):
+        """
+
+        :param key: 64-bit position hash
+        :param depth: remaining depth the score was searched to
+        :param bound: EXACT, LOWER or UPPER
+        :param score: score from the point of view of the side to move
+        :param move: best move, or None
+        """
+        key &= MASK64
+        offset = self.HEADER.size + (key & self.mask) * self.SLOT.size
+        generation = self.generation
+        if keeps(self.SLOT.unpack_from(self.memory.buf, offset)[1], depth, generation):
+            return
+        data = pack(depth, bound, score, move, generation)
+        self.SLOT.pack_into(self.memory.buf, offset, key ^ data, data)
+
+    def clear(self):
+        """
+        Empty every slot.
+        """
+        self.memory.buf[self.HEADER.size:] = bytes(self.slots * self.SLOT.size)
+
+    def close(self):
+        """
+        Detach from the table, and remove it if this process created it.
+        """
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __getstate__(self):
+        return {'name': self.name}
+
+    def __setstate__(self, state):
+        self.__init__(name=state['name'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,144 @@
+# coding=utf-8
+"""
+Ultimate tic-tac-toe
+"""
+import random
+
+from Games import O, PLAYERS, X
+from Games.render import Renderer
+
+FULL = (1 << 9) - 1
+COMBOS = [[0, 1, 2], [3, 4, 5], [6, 7, 8], [0, 3, 6], [1, 4, 7], [2, 5, 8], [0, 4, 8], [2, 4, 6]]
+# Whether a 9-bit mask of one side's stones holds a line, for every mask.
+WINS = [any(mask & sum(1 << i for i in combo) == sum(1 << i for i in combo) for combo in COMBOS)
+        for mask in range(1 << 9)]
+# Cells set in every 9-bit mask.
+CELLS = [tuple(cell for cell in range(9) if mask >> cell & 1) for mask in range(1 << 9)]
+# Frame index of every move, so the 9x9 grid reads as three rows of three boards.
+LAYOUT = [(board // 3 * 3 + cell // 3) * 9 + board % 3 * 3 + cell % 3 for board in range(9) for cell in range(9)]
+
+
+class Ultimate:
+    """
+    Ultimate tic-tac-toe: nine boards, and a meta-board won by taking three of them in a row.
+
+    A move is board * 9 + cell and sends the opponent to the board of the
+    same number as the cell, or anywhere if that board is won or full.
+    Each board is a pair of 9-bit masks, one per side, so sub-board wins
+    are a table lookup and the legal moves of a board are the clear bits of
+    their union. The board list of the 81 cells is kept for the
+    sandbox.TicTacToe interface.
+    """
+
+    def __init__(self):
+        self.board = [None] * 81
+        self.masks = {X: [0] * 9, O: [0] * 9}
+        self.won = {X: 0, O: 0}
+        self.closed = 0
+        self.active = None
+        self.history = []
+
+    def draw(self, renderer=None):
+        """
+        Draw the 81 cells as a 9x9 grid.
+
+        :param renderer: Games.render.Renderer 9 cells wide and 9 high
+        """
+        if renderer is None:
+            renderer = Renderer(9, 9)
+        cells = [None] * 81
+        for move, index in enumerate(LAYOUT):
+            cells[index] = self.board[move]
+        renderer.draw(cells)
+
+    def legal_moves(self):
+        """
+        Return a list of legal moves.
+        """
+        x, o = self.masks[X], self.masks[O]
+        if self.active is not None:
+            base = self.active * 9
+            return [base + cell for cell in CELLS[FULL ^ (x[self.active] | o[self.active])]]
+        if self.has_winner():
+            return []
+        return [board * 9 + cell for board in CELLS[FULL ^ self.closed]
+                for cell in CELLS[FULL ^ (x[board] | o[board])]]
+
+    def make_move(self, position, player):
+        """
+        Make a move on the board.
+        """
+        board, cell = divmod(position, 9)
+        self.history.append((position, self.active, self.closed, self.won[player]))
+        self.board[position] = player
+        masks = self.masks[player]
+        masks[board] |= 1 << cell
+        if WINS[masks[board]]:
+            self.won[player] |= 1 << board
+            self.closed |= 1 << board
+        elif self.masks[X][board] | self.masks[O][board] == FULL:
+            self.closed |= 1 << board
+        self.active = None if self.closed >> cell & 1 or WINS[self.won[player]] else cell
+
+    def undo_move(self, position):
+        """
+        Take back the last move.
+        """
+        position, self.active, self.closed, won = self.history.pop()
+        board, cell = divmod(position, 9)
+        player = self.board[position]
+        self.board[position] = None
+        self.masks[player][board] &= ~(1 << cell)
+        self.won[player] = won
+
+    def has_winner(self):
+        """
+        Return whether or not a side has three boards in a row.
+        """
+        return WINS[self.won[X]] or WINS[self.won[O]]
+
+    def game_over(self):
+        """
+        Return whether or not the game is over.
+        """
+        return self.has_winner() or self.closed == FULL
+
+    def playout(self, generator=random):
+        """
+        Play uniformly random moves to the end, on copies of the masks.
+
+        :param generator: random.Random or the random module
+        :return: 'X', 'O' or None for a draw
+        """
+        if WINS[self.won[X]]:
+            return X
+        if WINS[self.won[O]]:
+            return O
+        masks = [self.masks[X][:], self.masks[O][:]]
+        won = [self.won[X], self.won[O]]
+        closed = self.closed
+        active = self.active
+        turn = len(self.history) & 1
+        pick = generator.random
+        while closed != FULL:
+            own, other = masks[turn], masks[1 - turn]
+            if active is None:
+                moves = [board * 9 + cell for board in CELLS[FULL ^ closed]
+                         for cell in CELLS[FULL ^ (own[board] | other[board])]]
+                board, cell = divmod(moves[int(pick() * len(moves))], 9)
+            else:
+                board = active
+                free = CELLS[FULL ^ (own[board] | other[board])]
+                cell = free[int(pick() * len(free))]
+            stones = own[board] | 1 << cell
+            own[board] = stones
+            if WINS[stones]:
+                won[turn] |= 1 << board
+                if WINS[won[turn]]:
+                    return PLAYERS[turn]
+                closed |= 1 << board
+            elif stones | other[board] == FULL:
+                closed |= 1 << board
+            active = None if closed >> cell & 1 else cell
+            turn = 1 - turn
+        return None
@@ -0,0 +1,95 @@
+# coding=utf-8
+"""
+Vectorized win and threat detection
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from Games import O, X
+
+EMPTY = 0
+X_STONE = 1
+O_STONE = 2
+
+
+def stack(positions, m, n):
+    """
+    Return positions as one array, with the digits of Games.encode.
+
+    :param positions: iterable of board cell lists holding 'X', 'O' or None
+    :param m: cells per row
+    :param n: rows
+    :return: int8 array of shape (boards, n, m), 0 empty, 1 X, 2 O
+    """
+    digits = {None: EMPTY, X: X_STONE, O: O_STONE}
+    values = [digits[cell] for cells in positions for cell in cells]
+    return np.array(values, dtype=np.int8).reshape(-1, n, m)
+
+
+def windows(stones, k):
+    """
+    Return the number of stones in every k-cell line, for each direction.
+
+    Rows and columns are sliding windows along one axis; diagonals are the
+    diagonals of k by k windows, all views on the same memory.
+
+    :param stones: 0/1 array of shape (boards, n, m)
+    :param k: line length
+    :return: list of (sums, cells) per direction; sums has one entry per
+        line, indexed by its top-left corner, and cells lists the (row,
+        column) offsets of the line's cells from that corner
+    :raises ValueError: if the board is smaller than k in either dimension
+    """
+    if stones.shape[1] < k or stones.shape[2] < k:
+        raise ValueError('board of %dx%d has no line of %d' % (stones.shape[2], stones.shape[1], k))
+    square = sliding_window_view(stones, (k, k), axis=(1, 2))
+    return [
+        (sliding_window_view(stones, k, axis=2).sum(-1, dtype=np.int16), [(0, i) for i in range(k)]),
+        (sliding_window_view(stones, k, axis=1).sum(-1, dtype=np.int16), [(i, 0) for i in range(k)]),
+        (square.diagonal(axis1=-2, axis2=-1).sum(-1, dtype=np.int16), [(i, i) for i in range(k)]),
+        (square[..., ::-1].diagonal(axis1=-2, axis2=-1).sum(-1, dtype=np.int16), [(i, k - 1 - i) for i in range(k)]),
+    ]
+
+
+def winners(boards, k):
+    """
+    Return who has k in a row on each board.
+
+    :param boards: array from stack
+    :param k: stones in a row needed to win
+    :return: int8 array of shape (boards,): 0 nobody, 1 X, 2 O, 3 both
+    """
+    result = np.zeros(len(boards), dtype=np.int8)
+    for value in (X_STONE, O_STONE):
+        won = np.zeros(len(boards), dtype=bool)
+        for sums, _ in windows((boards == value).view(np.int8), k):
+            won |= (sums == k).any(axis=(1, 2))
+        result |= np.where(won, value, 0).astype(np.int8)
+    return result
+
+
+def threats(boards, k, missing=1):
+    """
+    Return the empty cells of open lines that lack only a few stones.
+
+    A line is open for a side when the other side has no stone on it. With
+    missing=1 the marked cells are the immediate threats: playing there
+    completes k in a row.
+
+    :param boards: array from stack
+    :param k: stones in a row needed to win
+    :param missing: stones a line may lack
+    :return: bool array of shape (boards, 2, n, m), X's threats first
+    """
+    count, n, m = boards.shape
+    empty = boards == EMPTY
+    result = np.zeros((count, 2, n, m), dtype=bool)
+    lines = {value: windows((boards == value).view(np.int8), k) for value in (X_STONE, O_STONE)}
+    for side, (value, other) in enumerate(((X_STONE, O_STONE), (O_STONE, X_STONE))):
+        for (own, cells), (theirs, _) in zip(lines[value], lines[other]):
+            open_lines = (own == k - missing) & (theirs == 0)
+            height, width = open_lines.shape[1:]
+            for row, column in cells:
+                result[:, side, row:row + height, column:column + width] |= \
+                    open_lines & empty[:, row:row + height, column:column + width]
+    return result
@@ -3,6 +3,9 @@
 Class
 """
 import sys
+import threading
+import weakref
+from time import perf_counter_ns
 
 true = True
 false = False
@@ -17,6 +20,11 @@ FAIL = '\033[91m'
 ENDC = '\033[0m'
 BOLD = '\033[1m'
 UNDERLINE = '\033[4m'
+BINARY = (bytes, bytearray, memoryview)
+BUCKETS = 40
+
+local = threading.local()
+instrumented = false
 
 
 class System:
@@ -28,6 +36,354 @@ class System:
         self.out = Out()
         self.err = Err()
 
+    @staticmethod
+    def capture(out=true, err=true, merge=false):
+        """
+        Return a context manager that captures Out and Err in the current thread.
+
+        :param out: whether to capture Out
+        :param err: whether to capture Err
+        :param merge: whether Err goes to the same buffer as Out
+        :return: Capture
+        """
+        return Capture(out, err, merge)
+
+    @staticmethod
+    def instrument(enabled=true, callback=null, interval=10.0):
+        """
+        Turn counting of Out and Err activity on or off.
+
+        While off, the only cost left in Out and Err is one flag check.
+
+        :param enabled: whether to count
+        :param callback: called with System.stats() every interval seconds while enabled
+        :param interval: seconds between callbacks
+        """
+        global instrumented
+        instrumented = enabled
+        reporter = meters.pop('reporter', null)
+        if reporter is not null:
+            reporter.set()
+        if enabled and callback is not null:
+            stop = meters['reporter'] = threading.Event()
+
+            def report():
+                while not stop.wait(interval):
+                    callback(System.stats())
+
+            threading.Thread(target=report, name='output-stats', daemon=true).start()
+
+    @staticmethod
+    def stats(reset=false):
+        """
+        Return the counters of both streams.
+
+        :param reset: whether to start counting from zero afterwards
+        :return: {'out': dict, 'err': dict}
+        """
+        snapshot = {'enabled': instrumented, 'out': meters['out'].snapshot(), 'err': meters['err'].snapshot()}
+        if reset:
+            meters['out'].reset()
+            meters['err'].reset()
+        return snapshot
+
+
+class Meter:
+    """
+    Counters of one output stream.
+
+    Every thread counts into its own Counter, so writes from several threads
+    never race on a shared total; snapshot() adds them up. Each thread also
+    keeps the Metered proxy of the stream it last wrote to. When a thread
+    ends its Counter is added to a retired total and forgotten, so only
+    live threads are summed.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.slot = 'meter_' + name
+        self.lock = threading.RLock()
+        self.counters = []
+        self.retired = Counter()
+
+    def state(self):
+        """
+        Return the current thread's [target, proxy, Counter], creating it on first use.
+        """
+        state = getattr(local, self.slot, null)
+        if state is null:
+            counter = Counter()
+            with self.lock:
+                self.counters.append(counter)
+            state = Slot([null, null, counter])
+            weakref.finalize(state, self.retire, counter)
+            setattr(local, self.slot, state)
+        return state
+
+    def retire(self, counter):
+        """
+        Fold the Counter of a thread that has ended into the retired total.
+        """
+        with self.lock:
+            self.counters.remove(counter)
+            self.retired.add(counter)
+
+    def reset(self):
+        """
+        Set every counter to zero.
+        """
+        with self.lock:
+            self.retired.reset()
+            for counter in self.counters:
+                counter.reset()
+
+    def wrap(self, stream):
+        """
+        Return a Metered proxy of a stream, reusing the thread's last one when the stream has not changed.
+        """
+        state = self.state()
+        if stream is not state[0]:
+            state[0] = stream
+            state[1] = Metered(state[2], stream)
+        return state[1]
+
+    def total(self):
+        """
+        Return the sum of every thread's counters.
+
+        :return: Counter
+        """
+        total = Counter()
+        with self.lock:
+            counters = list(self.counters)
+            total.add(self.retired)
+        for counter in counters:
+            total.add(counter)
+        return total
+
+    def snapshot(self):
+        """
+
+        :return: dict
+        """
+        total = self.total()
+        return {
+            'lines': total.lines,
+            'bytes': total.bytes,
+            'writes': total.writes,
+            'flushes': total.flushes,
+            'p50_ns': total.percentile(0.5),
+            'p99_ns': total.percentile(0.99),
+            'histogram': {1 << index: count for index, count in enumerate(total.histogram) if count},
+        }
+
+
+class Counter:
+    """
+    Counters of one output stream in one thread.
+
+    Write latencies go into log-scale buckets: bucket i counts writes that
+    took fewer than 2 ** i nanoseconds.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Set every counter to zero.
+        """
+        self.lines = 0
+        self.bytes = 0
+        self.writes = 0
+        self.flushes = 0
+        self.histogram = [0] * BUCKETS
+
+    def add(self, other):
+        """
+        Add another Counter's counts to this one.
+        """
+        self.lines += other.lines
+        self.bytes += other.bytes
+        self.writes += other.writes
+        self.flushes += other.flushes
+        for index, count in enumerate(other.histogram):
+            self.histogram[index] += count
+
+    def percentile(self, fraction):
+        """
+        Return the upper bound, in nanoseconds, of the bucket holding a latency percentile.
+
+        :param fraction: 0.5 for the median, 0.99 for p99
+        :return: int, or null before any write
+        """
+        total = sum(self.histogram)
+        if not total:
+            return null
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= fraction * total:
+                return 1 << index
+        return 1 << (BUCKETS - 1)
+
+
+class Slot(list):
+    """
+    A thread's [target, proxy, Counter] of one Meter; unlike a plain list it can be weakly referenced.
+    """
+
+
+class Metered:
+    """
+    Stream proxy that counts and times what passes through it.
+    """
+
+    def __init__(self, counter, target):
+        self.counter = counter
+        self.target = target
+        self.binary = null
+
+    @property
+    def buffer(self):
+        """
+        Metered proxy of the target's binary stream.
+        """
+        if self.binary is null:
+            self.binary = Metered(self.counter, self.target.buffer)
+        return self.binary
+
+    def write(self, value):
+        """
+
+        :param value: str or bytes-like
+        """
+        started = perf_counter_ns()
+        result = self.target.write(value)
+        elapsed = perf_counter_ns() - started
+        counter = self.counter
+        counter.histogram[min(elapsed.bit_length(), BUCKETS - 1)] += 1
+        counter.writes += 1
+        if isinstance(value, str):
+            counter.lines += value.count('\n')
+            counter.bytes += len(value) if value.isascii() else len(value.encode('utf-8', 'surrogateescape'))
+        else:
+            value = memoryview(value).cast('B')
+            counter.lines += bytes(value).count(b'\n')
+            counter.bytes += value.nbytes
+        return result
+
+    def writelines(self, values):
+        """
+
+        :param values: iterable of str or bytes-like
+        """
+        for value in values:
+            self.write(value)
+
+    def flush(self):
+        """
+
+        """
+        self.counter.flushes += 1
+        self.target.flush()
+
+
+class Buffer:
+    """
+    Growable in-memory stream that stores UTF-8 bytes.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+
+    @property
+    def buffer(self):
+        """
+        Binary view of the stream, like sys.stdout.buffer.
+        """
+        return self
+
+    def write(self, value):
+        """
+
+        :param value: str or bytes-like
+        :return: number of characters or bytes written
+        """
+        try:
+            self.data += value.encode('utf-8', 'surrogateescape')
+        except AttributeError:
+            self.data += value
+        return len(value)
+
+    def writelines(self, values):
+        """
+
+        :param values: iterable of str or bytes-like
+        """
+        for value in values:
+            self.write(value)
+
+    def flush(self):
+        """
+
+        """
+
+    def view(self):
+        """
+        Return the captured bytes without copying them.
+
+        The buffer cannot grow while the view is alive; release it before
+        writing more.
+
+        :return: memoryview
+        """
+        return memoryview(self.data)
+
+    def getvalue(self, errors='replace'):
+        """
+        Return the captured output decoded.
+
+        :param errors: how to handle bytes that are not UTF-8
+        :return: str
+        """
+        return self.data.decode('utf-8', errors)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class Capture:
+    """
+    Redirect Out and Err of the current thread into Buffers.
+
+    Captures nest: the innermost one receives the output, and the previous
+    targets come back when it exits. Other threads keep writing to their own
+    targets.
+    """
+
+    def __init__(self, out=true, err=true, merge=false):
+        """
+
+        :param out: whether to capture Out
+        :param err: whether to capture Err
+        :param merge: whether Err goes to the same buffer as Out
+        """
+        self.out = Buffer() if out else null
+        self.err = self.out if merge and out else Buffer() if err else null
+        self.saved = null
+
+    def __enter__(self):
+        self.saved = (getattr(local, 'out', null), getattr(local, 'err', null))
+        if self.out is not null:
+            local.out = self.out
+        if self.err is not null:
+            local.err = self.err
+        return self
+
+    def __exit__(self, *exc):
+        local.out, local.err = self.saved
+
 
 class Out:
     """
@@ -37,6 +393,19 @@ class Out:
     def __init__(self):
         pass
 
+    @staticmethod
+    def stream():
+        """
+        Return where output goes: the thread's capture buffer, or sys.stdout,
+        behind a Metered proxy while instrumentation is on.
+        """
+        stream = getattr(local, 'out', null)
+        if stream is null:
+            stream = sys.stdout
+        if instrumented:
+            return meters['out'].wrap(stream)
+        return stream
+
     @staticmethod
     def println(value, end="\r\n"):
         """
@@ -44,8 +413,9 @@ class Out:
         :param end:
         :param value:
         """
-        print(value, end=end)
-        sys.stdout.flush()
+        stream = Out.stream()
+        print(value, end=end, file=stream)
+        stream.flush()
 
     @staticmethod
     def print(value: str, iterability: bool = true):
@@ -53,12 +423,23 @@ class Out:
 
         :type iterability: bool
         :param iterability:
-        :param value:
+        :param value: str, or bytes written to the binary stream
         """
-        if iterability:
-            sys.stdout.writelines(value)
+        stream = Out.stream()
+        if isinstance(value, BINARY):
+            stream.flush()
+            stream.buffer.write(value)
+        elif iterability:
+            stream.writelines(value)
         else:
-            sys.stdout.write(value)
+            stream.write(value)
+
+    @staticmethod
+    def flush():
+        """
+
+        """
+        Out.stream().flush()
 
 
 class Err:
@@ -69,14 +450,28 @@ class Err:
     def __init__(self):
         self.placeholder = null
 
+    @staticmethod
+    def stream():
+        """
+        Return where output goes: the thread's capture buffer, or sys.stderr,
+        behind a Metered proxy while instrumentation is on.
+        """
+        stream = getattr(local, 'err', null)
+        if stream is null:
+            stream = sys.stderr
+        if instrumented:
+            return meters['err'].wrap(stream)
+        return stream
+
     @staticmethod
     def println(value):
         """
 
         :param value:
         """
-        sys.stderr.println(value)
-        sys.stderr.flush()
+        stream = Err.stream()
+        print(value, file=stream)
+        stream.flush()
 
     @staticmethod
     def print(value: str, iterability: bool = true):
@@ -84,12 +479,26 @@ class Err:
 
         :type iterability: bool
         :param iterability:
-        :param value:
+        :param value: str, or bytes written to the binary stream
         """
-        if iterability:
-            sys.stderr.writelines(value)
+        stream = Err.stream()
+        if isinstance(value, BINARY):
+            stream.flush()
+            stream.buffer.write(value)
+        elif iterability:
+            stream.writelines(value)
         else:
-            sys.stderr.write(value)
+            stream.write(value)
+
+    @staticmethod
+    def flush():
+        """
+
+        """
+        Err.stream().flush()
 
 
 System = System()
+meters = {'out': Meter('out'), 'err': Meter('err')}
+
+from Utils.canvas import Canvas  # noqa: E402
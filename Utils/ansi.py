@@ -0,0 +1,143 @@
+# coding=utf-8
+"""
+ANSI escape sequences
+"""
+import re
+
+from Utils import empty, null
+
+TEXT = 'text'
+CONTROL = 'control'
+
+# CSI sequences, string sequences (OSC, DCS, SOS, PM, APC) ended by BEL or
+# ST, and the remaining escapes of optional intermediates plus a final byte.
+PATTERN = '\033(?:\\[[0-?]*[ -/]*[@-~]|[\\]PX^_][^\007\033]*(?:\007|\033\\\\)|[ -/]*[0-OQ-WYZ\\\\`a-~])'
+# What a sequence cut off by the end of a chunk can look like.
+PARTIAL = '\033(?:\\[[0-?]*[ -/]*|[\\]PX^_][^\007\033]*\033?|[ -/]*)\\Z'
+
+ESCAPE = re.compile(PATTERN)
+ESCAPE_BYTES = re.compile(PATTERN.encode('ascii'))
+TAIL = re.compile(PARTIAL)
+TAIL_BYTES = re.compile(PARTIAL.encode('ascii'))
+# Longest cut-off sequence held back; a longer one, such as an OSC that is
+# never ended, is given back as text.
+HOLD = 1 << 12
+
+
+def strip_ansi(data):
+    """
+    Remove escape sequences from a str or bytes.
+
+    Input without an escape character is returned as is after a single
+    scan for it.
+
+    :param data: str or bytes
+    :return: same type as data
+    """
+    if isinstance(data, str):
+        if '\033' not in data:
+            return data
+        return ESCAPE.sub(empty, data)
+    if b'\033' not in data:
+        return data
+    return ESCAPE_BYTES.sub(b'', data)
+
+
+class Tokenizer:
+    """
+    Split a stream of str or bytes chunks into text and escape sequences.
+
+    A sequence cut by the end of a chunk is held back until the next chunk
+    completes it, so the spans come out the same however the stream was
+    split, as long as no sequence is longer than HOLD. Every span is
+    yielded as (TEXT, value) or (CONTROL, value).
+    """
+
+    def __init__(self):
+        self.pending = null
+
+    def feed(self, chunk):
+        """
+
+        :param chunk: str or bytes, the same type throughout a stream
+        :return: iterator of (kind, value)
+        """
+        binary = isinstance(chunk, (bytes, bytearray, memoryview))
+        if binary:
+            chunk = bytes(chunk)
+            escape, pattern, tail = b'\033', ESCAPE_BYTES, TAIL_BYTES
+        else:
+            escape, pattern, tail = '\033', ESCAPE, TAIL
+        position = scan = 0
+        if self.pending:
+            chunk = self.pending + chunk
+            self.pending = null
+            # The held sequence is only matched where it starts, not scanned for again.
+            match = pattern.match(chunk)
+            if match:
+                yield CONTROL, match.group()
+                position = scan = match.end()
+            else:
+                scan = 1
+        elif escape not in chunk:
+            if chunk:
+                yield TEXT, chunk
+            return
+        for match in pattern.finditer(chunk, scan):
+            if match.start() > position:
+                yield TEXT, chunk[position:match.start()]
+            yield CONTROL, match.group()
+            position = match.end()
+        end = len(chunk)
+        start = chunk.find(escape, position)
+        while start >= 0:
+            if len(chunk) - start <= HOLD and tail.match(chunk, start):
+                self.pending = chunk[start:]
+                end = start
+                break
+            start = chunk.find(escape, start + 1)
+        if end > position:
+            yield TEXT, chunk[position:end]
+
+    def close(self):
+        """
+        End the stream, giving back an unfinished sequence as text.
+
+        :return: iterator of (kind, value)
+        """
+        if self.pending:
+            yield TEXT, self.pending
+        self.pending = null
+
+
+def tokenize(chunks):
+    """
+    Tokenize a whole stream of chunks.
+
+    :param chunks: iterable of str or bytes
+    :return: iterator of (kind, value)
+    """
+    tokenizer = Tokenizer()
+    for chunk in chunks:
+        yield from tokenizer.feed(chunk)
+    yield from tokenizer.close()
+
+
+def strip_stream(chunks):
+    """
+    Remove escape sequences from a stream of chunks, even where a sequence spans two chunks.
+
+    :param chunks: iterable of str or bytes
+    :return: iterator of chunks of the same type
+    """
+    tokenizer = Tokenizer()
+    for chunk in chunks:
+        if not tokenizer.pending and ('\033' if isinstance(chunk, str) else b'\033') not in chunk:
+            if chunk:
+                yield chunk
+            continue
+        text = [value for kind, value in tokenizer.feed(chunk) if kind == TEXT]
+        if text:
+            yield text[0][:0].join(text)
+    for _, value in tokenizer.close():
+        yield value
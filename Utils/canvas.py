@@ -0,0 +1,151 @@
+# coding=utf-8
+"""
+Canvas
+"""
+from Utils import ENDC, System, empty, false, null
+
+
+def switch(current, style):
+    """
+    Return the escape codes that change the terminal from one style to another.
+
+    :param current: style in effect
+    :param style: style wanted
+    :return: str
+    """
+    if not current:
+        return style
+    return ENDC + style
+
+
+class Canvas:
+    """
+    Double-buffered grid of terminal cells.
+
+    Drawing goes to the back buffer. present() compares it with the front
+    buffer, which mirrors what the terminal shows, and writes only the cells
+    that differ: one cursor move per dirty run, a style change only where the
+    style does, all in a single write.
+    """
+
+    def __init__(self, width, height, top=1, left=1, out=null):
+        """
+
+        :param width: columns
+        :param height: rows
+        :param top: terminal row of the first canvas row, 1-based
+        :param left: terminal column of the first canvas column, 1-based
+        :param out: stream object with print and flush, System.out by default
+        """
+        self.width = width
+        self.height = height
+        self.top = top
+        self.left = left
+        self.out = out
+        self.chars = [' '] * (width * height)
+        self.styles = [empty] * (width * height)
+        self.shown_chars = [null] * (width * height)
+        self.shown_styles = [null] * (width * height)
+
+    def put(self, row, column, char, style=empty):
+        """
+
+        :param row: 0-based row
+        :param column: 0-based column
+        :param char: single character
+        :param style: escape codes such as Utils.OKGREEN + Utils.BOLD
+        """
+        if 0 <= row < self.height and 0 <= column < self.width:
+            index = row * self.width + column
+            self.chars[index] = char
+            self.styles[index] = style
+
+    def write(self, row, column, text, style=empty):
+        """
+        Put a string on one row, clipped to the canvas.
+
+        :param row: 0-based row
+        :param column: 0-based column of the first character
+        :param text: str
+        :param style: escape codes applied to every character
+        """
+        if not 0 <= row < self.height:
+            return
+        start = max(column, 0)
+        stop = min(column + len(text), self.width)
+        if start >= stop:
+            return
+        first = row * self.width
+        self.chars[first + start:first + stop] = text[start - column:stop - column]
+        self.styles[first + start:first + stop] = [style] * (stop - start)
+
+    def fill(self, char=' ', style=empty):
+        """
+        Set every cell of the back buffer.
+        """
+        self.chars = [char] * (self.width * self.height)
+        self.styles = [style] * (self.width * self.height)
+
+    def clear(self):
+        """
+        Blank the back buffer.
+        """
+        self.fill()
+
+    def invalidate(self):
+        """
+        Forget what the terminal shows, so the next present() redraws every cell.
+        """
+        self.shown_chars = [null] * (self.width * self.height)
+        self.shown_styles = [null] * (self.width * self.height)
+
+    def render(self):
+        """
+        Return the output that brings the terminal up to date, and mark it shown.
+
+        :return: str
+        """
+        width = self.width
+        chars, styles = self.chars, self.styles
+        shown_chars, shown_styles = self.shown_chars, self.shown_styles
+        parts = []
+        style = empty
+        cursor = null
+        for row in range(self.height):
+            first = row * width
+            for column in range(width):
+                index = first + column
+                if chars[index] == shown_chars[index] and styles[index] == shown_styles[index]:
+                    continue
+                if cursor != (row, column):
+                    if cursor is not null and cursor[0] == row and column - cursor[1] <= 4:
+                        for gap in range(first + cursor[1], index):
+                            if styles[gap] != style:
+                                parts.append(switch(style, styles[gap]))
+                                style = styles[gap]
+                            parts.append(chars[gap])
+                    else:
+                        parts.append('\033[%d;%dH' % (self.top + row, self.left + column))
+                if styles[index] != style:
+                    parts.append(switch(style, styles[index]))
+                    style = styles[index]
+                parts.append(chars[index])
+                shown_chars[index] = chars[index]
+                shown_styles[index] = style
+                cursor = (row, column + 1)
+        if style:
+            parts.append(ENDC)
+        return empty.join(parts)
+
+    def present(self):
+        """
+        Write the changes since the last present() in one call.
+
+        :return: number of characters written
+        """
+        text = self.render()
+        if text:
+            out = self.out or System.out
+            out.print(text, false)
+            out.flush()
+        return len(text)
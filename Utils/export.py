@@ -0,0 +1,228 @@
+# coding=utf-8
+"""
+HTML export
+"""
+import codecs
+from functools import lru_cache
+from html import escape
+
+from Utils import System, empty, false, null, true
+from Utils.ansi import CONTROL, Tokenizer
+
+# Class names of the colors Utils defines, by SGR code; other colors get fg-N or bg-N.
+NAMES = {91: 'fail', 92: 'okgreen', 93: 'warning', 94: 'okblue', 95: 'header', 96: 'okcyan'}
+
+PALETTE = {
+    30: '#000000', 31: '#cd3131', 32: '#0dbc79', 33: '#e5e510',
+    34: '#2472c8', 35: '#bc3fbc', 36: '#11a8cd', 37: '#e5e5e5',
+    90: '#666666', 91: '#f14c4c', 92: '#23d18b', 93: '#f5f543',
+    94: '#3b8eea', 95: '#d670d6', 96: '#29b8db', 97: '#ffffff',
+}
+
+
+def color_class(code):
+    """
+    Return the class name of a foreground (30-37, 90-97) or background (40-47, 100-107) code.
+    """
+    if code in NAMES:
+        return NAMES[code]
+    if 40 <= code <= 47 or 100 <= code <= 107:
+        return 'bg-%d' % (code - 10)
+    return 'fg-%d' % code
+
+
+PLAIN = (null, null, false, false)
+
+
+@lru_cache(maxsize=1024)
+def classes(style):
+    """
+    Return the class attribute for a style, empty when unstyled.
+
+    :param style: (foreground, background, bold, underline)
+    :return: str
+    """
+    foreground, background, bold, underline = style
+    names = []
+    if foreground is not null:
+        names.append(color_class(foreground))
+    if background is not null:
+        names.append(color_class(background))
+    if bold:
+        names.append('bold')
+    if underline:
+        names.append('underline')
+    return ' '.join(names)
+
+
+@lru_cache(maxsize=4096)
+def select(style, parameters):
+    """
+    Apply the parameters of an SGR sequence to a style.
+
+    :param style: (foreground, background, bold, underline)
+    :param parameters: text between the CSI and the final 'm'
+    :return: new style
+    """
+    foreground, background, bold, underline = style
+    codes = [int(code) if code.isdigit() else 0 for code in parameters.split(';')] if parameters else [0]
+    index = 0
+    while index < len(codes):
+        code = codes[index]
+        if code == 0:
+            foreground, background, bold, underline = PLAIN
+        elif code == 1:
+            bold = true
+        elif code == 22:
+            bold = false
+        elif code == 4:
+            underline = true
+        elif code == 24:
+            underline = false
+        elif 30 <= code <= 37 or 90 <= code <= 97:
+            foreground = code
+        elif code == 39:
+            foreground = null
+        elif 40 <= code <= 47 or 100 <= code <= 107:
+            background = code
+        elif code == 49:
+            background = null
+        elif code in (38, 48) and index + 1 < len(codes):
+            index += 2 if codes[index + 1] == 5 else 4
+        index += 1
+    return foreground, background, bold, underline
+
+
+def stylesheet():
+    """
+    Return CSS for every class the exporter emits.
+
+    :return: str
+    """
+    rules = ['pre.ansi { background: #1e1e1e; color: #d4d4d4; }',
+             '.bold { font-weight: bold; }',
+             '.underline { text-decoration: underline; }']
+    for code, color in PALETTE.items():
+        rules.append('.%s { color: %s; }' % (color_class(code), color))
+        rules.append('.bg-%d { background-color: %s; }' % (code, color))
+    return '\n'.join(rules)
+
+
+class HtmlExporter:
+    """
+    Convert a stream of ANSI-colored output to HTML as it arrives.
+
+    Only the current style is kept between chunks. Style changes with no
+    text between them are merged, and a span is only opened when the style
+    of the text actually differs from the one already open, so runs of
+    resets and reapplied colors do not multiply the markup. A sequence
+    cut by a chunk boundary is held back only up to Utils.ansi.HOLD, so
+    an escape that is never ended, such as a stray OSC, is written as text
+    and the output goes on as it arrives.
+    """
+
+    def __init__(self, out=null, document=true, title='Output'):
+        """
+
+        :param out: file-like object with write, System.out by default
+        :param document: whether to wrap the output in a complete HTML page
+        :param title: page title when document is set
+        """
+        self.out = out
+        self.document = document
+        self.title = title
+        self.tokenizer = Tokenizer()
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.style = PLAIN
+        self.open = empty
+        self.started = false
+
+    def write(self, text):
+        """
+        Send converted output on.
+        """
+        if self.out is null:
+            System.out.print(text, false)
+        else:
+            self.out.write(text)
+
+    def feed(self, chunk):
+        """
+        Convert a chunk and write the result in one call.
+
+        :param chunk: str or bytes; bytes are decoded as UTF-8
+        """
+        if not isinstance(chunk, str):
+            chunk = self.decoder.decode(bytes(chunk))
+        parts = []
+        if not self.started:
+            self.started = true
+            if self.document:
+                parts.append('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>%s</title>\n'
+                             '<style>\n%s\n</style>\n</head>\n<body>\n' % (escape(self.title), stylesheet()))
+            parts.append('<pre class="ansi">')
+        self.spans(self.tokenizer.feed(chunk), parts)
+        if parts:
+            self.write(empty.join(parts))
+
+    def spans(self, tokens, parts):
+        """
+        Add tokens to the output, applying color sequences to the style and dropping other sequences.
+        """
+        for kind, value in tokens:
+            if kind == CONTROL:
+                if value[-1] == 'm' and value[1] == '[':
+                    self.style = select(self.style, value[2:-1])
+                continue
+            self.text(value, parts)
+
+    def text(self, value, parts):
+        """
+        Add escaped text to the output, switching spans if the style changed.
+        """
+        current = classes(self.style)
+        if current != self.open:
+            if self.open:
+                parts.append('</span>')
+            self.open = current
+            if current:
+                parts.append('<span class="%s">' % current)
+        parts.append(escape(value, false))
+
+    def close(self):
+        """
+        Write the end of the output.
+        """
+        parts = []
+        if not self.started:
+            self.feed(empty)
+        # The decoder tail goes after any sequence the tokenizer still holds back.
+        self.spans(self.tokenizer.feed(self.decoder.decode(b'', true)), parts)
+        self.spans(self.tokenizer.close(), parts)
+        if self.open:
+            parts.append('</span>')
+            self.open = empty
+        parts.append('</pre>')
+        if self.document:
+            parts.append('\n</body>\n</html>\n')
+        self.write(empty.join(parts))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export(chunks, out=null, document=true, title='Output'):
+    """
+    Convert a whole stream, such as a log file opened in binary mode.
+
+    :param chunks: iterable of str or bytes
+    :param out: file-like object with write, System.out by default
+    :param document: whether to write a complete HTML page
+    :param title: page title
+    """
+    with HtmlExporter(out, document, title) as exporter:
+        for chunk in chunks:
+            exporter.feed(chunk)
@@ -0,0 +1,160 @@
+# coding=utf-8
+"""
+Progress
+"""
+import sys
+from time import monotonic
+
+from Utils import System, empty, false, null, true
+
+
+def si(value):
+    """
+    Format a number with a metric suffix.
+
+    :param value: number
+    :return: str
+    """
+    for suffix in ('', 'k', 'M', 'G'):
+        if abs(value) < 1000:
+            return ('%.0f%s' if suffix == '' else '%.1f%s') % (value, suffix)
+        value /= 1000.0
+    return '%.1fT' % value
+
+
+def duration(seconds):
+    """
+    Format seconds as h:mm:ss.
+
+    :param seconds: number
+    :return: str
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '%d:%02d:%02d' % (hours, minutes, seconds)
+
+
+class Progress:
+    """
+    Throttled progress and throughput meter.
+
+    tick() only adds to a counter and compares it with a threshold; the
+    clock is read once the threshold is passed, and the threshold is spaced
+    so that happens a few times per redraw interval whatever the tick rate;
+    it at most doubles per check, so a bad early estimate cannot stall it.
+    On a terminal the line is redrawn in place at most every interval
+    seconds; elsewhere a summary line is printed every summary seconds.
+    """
+
+    def __init__(self, total=null, label=empty, interval=0.1, summary=10.0, half_life=2.0, out=null, tty=null):
+        """
+
+        :param total: expected number of ticks, if known
+        :param label: text in front of the counters
+        :param interval: seconds between redraws on a terminal
+        :param summary: seconds between summary lines elsewhere
+        :param half_life: seconds after which a rate sample weighs half in the moving average
+        :param out: stream object with print and flush, System.out by default
+        :param tty: whether to redraw in place, detected from sys.stdout by default
+        """
+        self.total = total
+        self.label = label
+        self.tty = sys.stdout.isatty() if tty is null else tty
+        self.interval = interval if self.tty else summary
+        self.half_life = half_life
+        self.out = out
+        self.count = 0
+        self.start = self.last = self.drawn = monotonic()
+        self.last_count = 0
+        self.average = 0.0
+        self.decay = 1.0
+        self.ewma = 0.0
+        self.stride = 1
+        self.next = 1
+        self.closed = false
+
+    def tick(self, n=1):
+        """
+
+        :param n: units of work done
+        """
+        self.count += n
+        if self.count >= self.next:
+            self.update()
+
+    def update(self):
+        """
+        Fold a rate sample into the average, redraw if due and space out the next check.
+
+        The moving average starts from zero, so it is divided by the weight
+        gathered so far to keep early readings unbiased.
+        """
+        now = monotonic()
+        elapsed = now - self.last
+        if elapsed > 0:
+            rate = (self.count - self.last_count) / elapsed
+            decay = 0.5 ** (elapsed / self.half_life)
+            self.average += (1.0 - decay) * (rate - self.average)
+            self.decay *= decay
+            self.ewma = self.average / (1.0 - self.decay)
+            self.last = now
+            self.last_count = self.count
+            self.stride = max(1, min(2 * self.stride, int(self.ewma * self.interval / 4)))
+        if now - self.drawn >= self.interval:
+            self.draw(now)
+        self.next = self.count + self.stride
+
+    def line(self, now):
+        """
+        Return the status line.
+
+        :param now: time.monotonic() value
+        :return: str
+        """
+        elapsed = now - self.start
+        average = self.count / elapsed if elapsed > 0 else 0.0
+        parts = [self.label] if self.label else []
+        if self.total:
+            parts.append('%s/%s %5.1f%%' % (si(self.count), si(self.total), 100.0 * self.count / self.total))
+        else:
+            parts.append(si(self.count))
+        parts.append('%s/s avg %s/s now' % (si(average), si(self.ewma)))
+        if self.total and not self.closed:
+            rate = self.ewma or average
+            if rate > 0:
+                parts.append('ETA ' + duration(max(self.total - self.count, 0) / rate))
+        else:
+            parts.append('in ' + duration(elapsed))
+        return ' '.join(parts)
+
+    def draw(self, now):
+        """
+        Write the status line.
+
+        :param now: time.monotonic() value
+        """
+        self.drawn = now
+        out = self.out or System.out
+        if self.tty:
+            out.print('\r' + self.line(now) + '\033[K', false)
+        else:
+            out.print(self.line(now) + '\n', false)
+        out.flush()
+
+    def close(self):
+        """
+        Write the final line.
+        """
+        if self.closed:
+            return
+        self.closed = true
+        now = monotonic()
+        self.draw(now)
+        if self.tty:
+            (self.out or System.out).print('\n', false)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,149 @@
+# coding=utf-8
+"""
+Table
+"""
+from Utils import System, false, null, true
+from Utils.width import display_width, truncate
+
+
+class TableWriter:
+    """
+    Write rows as an aligned table without holding the whole table.
+
+    Column widths are estimated from the first sample rows, which are the
+    only rows ever held in memory. After that every row is formatted as it
+    arrives and output is written in chunks. A later cell wider than its
+    column widens the column, up to max_width, for the rows that follow;
+    wider text is truncated, while a wider number widens the column past
+    max_width so that it is never cut.
+    """
+
+    def __init__(self, columns=null, sample=100, max_width=40, separator=' | ', chunk=1 << 16, out=null):
+        """
+
+        :param columns: header names, if any
+        :param sample: rows read before the widths are fixed
+        :param max_width: widest a column may get
+        :param separator: text between columns
+        :param chunk: characters gathered before a write
+        :param out: stream object with print and flush, System.out by default
+        """
+        self.columns = columns
+        self.sample = sample
+        self.max_width = max_width
+        self.separator = separator
+        self.chunk = chunk
+        self.out = out
+        self.pending = []
+        self.widths = null
+        self.right = null
+        self.buffer = []
+        self.buffered = 0
+        self.rows = 0
+
+    def write(self, row):
+        """
+
+        :param row: sequence of cells; numbers are right-aligned
+        """
+        self.rows += 1
+        if self.widths is null:
+            self.pending.append(row)
+            if len(self.pending) >= self.sample:
+                self.start()
+            return
+        self.emit(self.format(row))
+
+    def writerows(self, rows):
+        """
+
+        :param rows: iterable of rows
+        """
+        for row in rows:
+            self.write(row)
+
+    def start(self):
+        """
+        Fix the column widths from the sampled rows and write them out.
+        """
+        rows = self.pending
+        count = max([len(row) for row in rows] + [len(self.columns or ())])
+        widths = [0] * count
+        right = [true] * count
+        if self.columns:
+            for index, name in enumerate(self.columns):
+                widths[index] = display_width(str(name))
+        for row in rows:
+            for index, cell in enumerate(row):
+                if not isinstance(cell, (int, float)):
+                    right[index] = false
+                widths[index] = max(widths[index], display_width(str(cell)))
+        self.widths = [min(size, self.max_width) for size in widths]
+        self.right = right
+        if self.columns:
+            self.emit(self.format(self.columns, header=true))
+            joint = self.separator.replace(' ', '-').replace('|', '+')
+            self.emit(joint.join('-' * size for size in self.widths))
+        self.pending = []
+        for row in rows:
+            self.emit(self.format(row))
+
+    def format(self, row, header=false):
+        """
+        Return one row as a line of text.
+
+        :param row: sequence of cells
+        :param header: whether the row is the header, which is always left-aligned
+        :return: str
+        """
+        widths = self.widths
+        cells = []
+        for index, cell in enumerate(row):
+            text = str(cell)
+            if index >= len(widths):
+                widths.append(0)
+                self.right.append(false)
+            size = display_width(text)
+            if size > widths[index]:
+                if size <= self.max_width or not header and isinstance(cell, (int, float)):
+                    widths[index] = size
+                else:
+                    widths[index] = self.max_width
+                    text, size = truncate(text, self.max_width)
+            padding = ' ' * (widths[index] - size)
+            cells.append(padding + text if self.right[index] and not header else text + padding)
+        return self.separator.join(cells).rstrip()
+
+    def emit(self, line):
+        """
+        Add a line to the buffer and write the buffer once it holds a chunk.
+        """
+        self.buffer.append(line)
+        self.buffered += len(line) + 1
+        if self.buffered >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        """
+        Write whatever is buffered.
+        """
+        if self.buffer:
+            out = self.out or System.out
+            out.print('\n'.join(self.buffer) + '\n', false)
+            out.flush()
+            self.buffer = []
+            self.buffered = 0
+
+    def close(self):
+        """
+        Write the rows still held, including a sample that never filled up.
+        """
+        if self.widths is null and (self.pending or self.columns):
+            self.start()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
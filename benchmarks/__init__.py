@@ -0,0 +1,82 @@
+# coding=utf-8
+"""
+Benchmarks
+"""
+import json
+import platform
+import sys
+import time
+
+
+def metadata():
+    """
+    Return a description of the machine and interpreter a run was made on.
+
+    :return: dict
+    """
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def percentile(values, fraction):
+    """
+    Return a percentile of a sorted list.
+
+    :param values: sorted numbers
+    :param fraction: 0.5 for the median, 0.99 for p99
+    :return: number, or None for an empty list
+    """
+    if not values:
+        return None
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def save(results, path=None):
+    """
+    Write results as JSON to a file, or to standard output.
+
+    :param results: list of dicts, each with a unique 'name'
+    :param path: file name, standard output when None
+    """
+    document = {'meta': metadata(), 'results': results}
+    if path is None:
+        json.dump(document, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(path, 'w') as file:
+            json.dump(document, file, indent=2)
+
+
+def compare(results, path, metrics, tolerance=0.1):
+    """
+    Print how results differ from a saved baseline.
+
+    :param results: list of dicts, each with a unique 'name'
+    :param path: baseline written by save
+    :param metrics: {metric: True if higher is better, False if lower is}
+    :param tolerance: relative change treated as noise
+    :return: number of regressions
+    """
+    with open(path) as file:
+        baseline = {result['name']: result for result in json.load(file)['results']}
+    regressions = 0
+    for result in results:
+        old = baseline.get(result['name'])
+        if old is None:
+            continue
+        for metric, higher in metrics.items():
+            before, after = old.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = change < -tolerance if higher else change > tolerance
+            regressions += worse
+            print('%-60s %-12s %12.4g -> %12.4g %+7.1f%%%s' % (
+                result['name'], metric, before, after, 100 * change, '  REGRESSION' if worse else ''),
+                file=sys.stderr)
+    return regressions
@@ -0,0 +1,221 @@
+# coding=utf-8
+"""
+Engine benchmarks
+
+Counts nodes per second of full game-tree enumeration (perft), times the
+sandbox.TicTacToe primitives in isolation, and measures search, random
+playout and batch evaluation throughput. Perft counts of the 3x3 game are
+checked against the known values, including its 255,168 complete games.
+
+    python -m benchmarks.engine --output baseline.json
+    python -m benchmarks.engine --compare baseline.json
+    python -m benchmarks.engine --board 4 4 3 --depth 6
+"""
+import argparse
+import random
+import sys
+from time import perf_counter
+
+from Games import to_move
+from Games.batch import BatchEvaluator
+from Games.search import Search
+from Games.transposition import TranspositionTable
+from benchmarks import compare, save
+from sandbox import MNKGame, TicTacToe
+
+# Move sequences of each length in which nobody has won before the last move.
+PERFT = [1, 9, 72, 504, 3024, 15120, 54720, 148176, 200448, 127872]
+GAMES = 255168
+METRICS = {'nodes_per_s': True, 'ops_per_s': True, 'ns_per_op': False}
+
+
+def perft(game, depth, player='X'):
+    """
+    Count the move sequences of a given length, stopping at wins.
+
+    :param game: game to enumerate from; it is restored afterwards
+    :param depth: plies
+    :param player: side to move
+    :return: (sequences, complete games ending within depth)
+    """
+    if depth == 0:
+        return 1, 0
+    moves = game.legal_moves()
+    if not moves:
+        return 0, 0
+    other = 'O' if player == 'X' else 'X'
+    sequences = games = 0
+    for move in moves:
+        game.make_move(move, player)
+        if game.has_winner():
+            sequences += depth == 1
+            games += 1
+        elif depth == 1:
+            sequences += 1
+            games += len(moves) == 1
+        else:
+            counted, ended = perft(game, depth - 1, other)
+            sequences += counted
+            games += ended
+        game.undo_move(move)
+    return sequences, games
+
+
+def positions(game, count, seed=1):
+    """
+    Return random positions reached by random play, none of them finished.
+    """
+    generator = random.Random(seed)
+    size = len(game.board)
+    sample = []
+    while len(sample) < count:
+        game.board = [None] * size
+        for _ in range(generator.randrange(size)):
+            move = generator.choice(game.legal_moves())
+            game.make_move(move, to_move(game.board))
+            if game.has_winner():
+                game.undo_move(move)
+                break
+        sample.append(list(game.board))
+    game.board = [None] * size
+    return sample
+
+
+def timed(name, operation, count, repeat=3):
+    """
+    Time an operation count times, best of repeat.
+
+    :return: dict of results
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = perf_counter()
+        operation()
+        best = min(best, perf_counter() - started)
+    return {'name': name, 'ops': count, 'seconds': best, 'ops_per_s': count / best, 'ns_per_op': best / count * 1e9}
+
+
+def primitives(game, count):
+    """
+    Time legal_moves, make_move with undo_move, and has_winner on random positions.
+    """
+    sample = positions(game, 256)
+    boards = [sample[i % len(sample)] for i in range(count)]
+
+    def legal_moves():
+        for cells in boards:
+            game.board = cells
+            game.legal_moves()
+
+    def make_move():
+        for cells in boards:
+            game.board = cells
+            for move in range(len(cells)):
+                if cells[move] is None:
+                    game.make_move(move, 'X')
+                    game.undo_move(move)
+                    break
+
+    def has_winner():
+        for cells in boards:
+            game.board = cells
+            game.has_winner()
+
+    results = [timed('primitive/legal_moves', legal_moves, count),
+               timed('primitive/make_move+undo_move', make_move, count),
+               timed('primitive/has_winner', has_winner, count)]
+    game.board = [None] * len(game.board)
+    return results
+
+
+def playouts(game, count, seed=1):
+    """
+    Time random games played to the end.
+    """
+    generator = random.Random(seed)
+    size = len(game.board)
+
+    def play():
+        for _ in range(count):
+            game.board = [None] * size
+            player = 'X'
+            moves = game.legal_moves()
+            while moves:
+                move = generator.choice(moves)
+                game.make_move(move, player)
+                if game.has_winner():
+                    break
+                player = 'O' if player == 'X' else 'X'
+                moves = game.legal_moves()
+
+    result = timed('simulation/random-playouts', play, count)
+    game.board = [None] * size
+    return result
+
+
+def main(arguments=None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--board', nargs=3, type=int, metavar=('M', 'N', 'K'),
+                        help='benchmark an MNKGame instead of TicTacToe')
+    parser.add_argument('--depth', type=int, help='deepest perft, the whole game by default')
+    parser.add_argument('--count', type=int, default=20000, help='operations per primitive timing')
+    parser.add_argument('--output', help='write JSON results to this file instead of standard output')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare with results saved by --output')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='relative change treated as noise')
+    options = parser.parse_args(arguments)
+    game = MNKGame(*options.board) if options.board else TicTacToe()
+    label = '%dx%dx%d' % tuple(options.board) if options.board else '3x3'
+    depth = options.depth if options.depth is not None else len(game.board)
+    results = []
+    failures = 0
+    for ply in range(1, depth + 1):
+        started = perf_counter()
+        sequences, games = perft(game, ply)
+        elapsed = perf_counter() - started
+        result = {'name': '%s/perft/%d' % (label, ply), 'nodes': sequences, 'games': games,
+                  'seconds': elapsed, 'nodes_per_s': sequences / elapsed if elapsed else None}
+        if not options.board and ply < len(PERFT):
+            result['expected'] = PERFT[ply]
+            result['correct'] = sequences == PERFT[ply] and (ply < 9 or games == GAMES)
+            failures += not result['correct']
+        results.append(result)
+        print('perft %d: %d nodes, %d games, %.3fs' % (ply, sequences, games, elapsed), file=sys.stderr)
+    for result in primitives(game, options.count):
+        result['name'] = label + '/' + result['name']
+        results.append(result)
+    search = Search(game, TranspositionTable(1 << 22))
+    started = perf_counter()
+    search.best_move(budget=5.0)
+    elapsed = perf_counter() - started
+    results.append({'name': label + '/search/best_move', 'nodes': search.nodes, 'seconds': elapsed,
+                    'nodes_per_s': search.nodes / elapsed})
+    search = Search(game)
+    started = perf_counter()
+    search.solve(min(depth, 6))
+    elapsed = perf_counter() - started
+    results.append({'name': label + '/search/alpha-beta-depth-%d' % min(depth, 6), 'nodes': search.nodes,
+                    'seconds': elapsed, 'nodes_per_s': search.nodes / elapsed})
+    result = playouts(game, max(options.count // 10, 1))
+    result['name'] = label + '/' + result['name']
+    results.append(result)
+    if not options.board:
+        evaluator = BatchEvaluator()
+        sample = positions(game, options.count)
+        result = timed('simulation/batch-evaluate', lambda: evaluator.evaluate(sample), len(sample))
+        result['name'] = label + '/' + result['name']
+        results.append(result)
+    for result in results[depth:]:
+        print('%-40s %14.0f /s' % (result['name'], result.get('ops_per_s') or result.get('nodes_per_s')),
+              file=sys.stderr)
+    save(results, options.output)
+    status = 1 if failures else 0
+    if options.compare and compare(results, options.compare, METRICS, options.tolerance):
+        status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
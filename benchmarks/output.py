@@ -0,0 +1,175 @@
+# coding=utf-8
+"""
+Output benchmarks
+
+Measures Utils.System.out and System.err against print and sys.stdout.write
+for small and large, plain and colored messages, written by one or several
+threads to a pseudo-terminal, a pipe, a file or /dev/null.
+
+    python -m benchmarks.output --output baseline.json
+    python -m benchmarks.output --compare baseline.json
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import threading
+from time import perf_counter, perf_counter_ns
+
+from Utils import ENDC, OKGREEN, System
+from benchmarks import compare, percentile, save
+
+SIZES = {'small': 40, 'large': 4096}
+METRICS = {'lines_per_s': True, 'mb_per_s': True, 'p50_us': False, 'p99_us': False}
+
+
+def message(size, colored):
+    """
+    Return a message of about size characters.
+    """
+    text = ('benchmark output line ' * (size // 22 + 1))[:size]
+    if colored:
+        return OKGREEN + text[:size // 2] + ENDC + text[size // 2:]
+    return text
+
+
+def drain(fd):
+    """
+    Read and discard everything written to the other end of fd.
+    """
+    try:
+        while os.read(fd, 1 << 16):
+            pass
+    except OSError:
+        pass
+
+
+class Sink:
+    """
+    Text stream that stands in for sys.stdout and sys.stderr during a case.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.thread = None
+        self.reader = None
+        self.path = None
+        if kind == 'pty':
+            import pty
+            self.reader, fd = pty.openpty()
+        elif kind == 'pipe':
+            self.reader, fd = os.pipe()
+        elif kind == 'file':
+            fd, self.path = tempfile.mkstemp(prefix='output-bench-')
+        else:
+            fd = os.open(os.devnull, os.O_WRONLY)
+        if self.reader is not None:
+            self.thread = threading.Thread(target=drain, args=(self.reader,), daemon=True)
+            self.thread.start()
+        self.stream = io.TextIOWrapper(open(fd, 'wb'), encoding='utf-8', line_buffering=kind == 'pty')
+
+    def close(self):
+        self.stream.close()
+        if self.thread is not None:
+            self.thread.join(5)
+            os.close(self.reader)
+        if self.path is not None:
+            os.unlink(self.path)
+
+
+WRITERS = {
+    'out.println': lambda text: System.out.println(text),
+    'out.print': lambda text: System.out.print(text + '\n', False),
+    'err.println': lambda text: System.err.println(text),
+    'print': lambda text: print(text),
+    'stdout.write': lambda text: sys.stdout.write(text + '\n'),
+}
+
+
+def run(sink, writer, size, colored, threads, count):
+    """
+    Run one case.
+
+    :return: dict of results
+    """
+    text = message(SIZES[size], colored)
+    write = WRITERS[writer]
+    latencies = [[] for _ in range(threads)]
+    per_thread = count // threads
+
+    def worker(samples):
+        append = samples.append
+        for _ in range(per_thread):
+            started = perf_counter_ns()
+            write(text)
+            append(perf_counter_ns() - started)
+
+    target = Sink(sink)
+    saved = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = target.stream
+    try:
+        started = perf_counter()
+        workers = [threading.Thread(target=worker, args=(samples,)) for samples in latencies]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        target.stream.flush()
+        elapsed = perf_counter() - started
+    finally:
+        sys.stdout, sys.stderr = saved
+        target.close()
+    samples = sorted(sample for thread in latencies for sample in thread)
+    lines = per_thread * threads
+    return {
+        'name': '%s/%s/%s/%s/%dt' % (sink, writer, size, 'color' if colored else 'plain', threads),
+        'sink': sink,
+        'writer': writer,
+        'size': size,
+        'colored': colored,
+        'threads': threads,
+        'lines': lines,
+        'seconds': elapsed,
+        'lines_per_s': lines / elapsed,
+        'mb_per_s': lines * (len(text.encode('utf-8')) + 1) / elapsed / 1e6,
+        'p50_us': percentile(samples, 0.5) / 1000.0,
+        'p99_us': percentile(samples, 0.99) / 1000.0,
+    }
+
+
+def main(arguments=None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sinks', nargs='+', default=['pty', 'pipe', 'file', 'devnull'],
+                        choices=['pty', 'pipe', 'file', 'devnull'])
+    parser.add_argument('--writers', nargs='+', default=list(WRITERS), choices=list(WRITERS))
+    parser.add_argument('--sizes', nargs='+', default=list(SIZES), choices=list(SIZES))
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--count', type=int, default=20000, help='lines per small-message case')
+    parser.add_argument('--output', help='write JSON results to this file instead of standard output')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare with results saved by --output')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='relative change treated as noise')
+    options = parser.parse_args(arguments)
+    if 'pty' in options.sinks and os.name != 'posix':
+        options.sinks.remove('pty')
+    results = []
+    for sink in options.sinks:
+        for writer in options.writers:
+            for size in options.sizes:
+                for colored in (False, True):
+                    for threads in options.threads:
+                        count = options.count if size == 'small' else max(options.count // 20, threads)
+                        results.append(run(sink, writer, size, colored, threads, count))
+                        print('%-50s %12.0f lines/s' % (results[-1]['name'], results[-1]['lines_per_s']),
+                              file=sys.stderr)
+    save(results, options.output)
+    if options.compare:
+        return 1 if compare(results, options.compare, METRICS, options.tolerance) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
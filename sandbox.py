@@ -2,6 +2,8 @@
 # Description:
 # A game of tic-tac-toe.
 #
+from Games import shape
+from Games.render import Renderer
 
 
 class TicTacToe:
@@ -15,28 +17,23 @@ class TicTacToe:
             [0, 3, 6], [1, 4, 7], [2, 5, 8],
             [0, 4, 8], [2, 4, 6]]
 
-    def draw(self):
+    def draw(self, renderer=None):
         """
         Draw the board.
+
+        :param renderer: Games.render.Renderer to draw with, so that later
+            frames only redraw the changed cells; a full frame by default
         """
-        print('   |   |')
-        print(' ' + self.board[0] + ' | ' + self.board[1] + ' | ' + self.board[2])
-        print('   |   |')
-        print('-----------')
-        print('   |   |')
-        print(' ' + self.board[3] + ' | ' + self.board[4] + ' | ' + self.board[5])
-        print('   |   |')
-        print('-----------')
-        print('   |   |')
-        print(' ' + self.board[6] + ' | ' + self.board[7] + ' | ' + self.board[8])
-        print('   |   |')
+        if renderer is None:
+            renderer = Renderer(*shape(self))
+        renderer.draw(self.board)
 
     def legal_moves(self):
         """
         Return a list of legal moves.
         """
         moves = []
-        for i in range(9):
+        for i in range(len(self.board)):
             if self.board[i] is None:
                 moves.append(i)
         return moves
@@ -47,6 +44,12 @@ class TicTacToe:
         """
         self.board[position] = player
 
+    def undo_move(self, position):
+        """
+        Take back a move on the board.
+        """
+        self.board[position] = None
+
     def has_winner(self):
         """
         Return whether or not there is a winner.
@@ -63,3 +66,36 @@ class TicTacToe:
         Return whether or not the game is over.
         """
         return
+
+
+class MNKGame(TicTacToe):
+    """
+    A game of k-in-a-row on an m by n board.
+    """
+    def __init__(self, m=3, n=3, k=3):
+        super().__init__()
+        self.m = m
+        self.n = n
+        self.k = k
+        self.board = [None] * (m * n)
+        self.winning_combos = []
+        for row in range(n):
+            for column in range(m):
+                for step_row, step_column in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    last_row = row + step_row * (k - 1)
+                    last_column = column + step_column * (k - 1)
+                    if last_row < n and 0 <= last_column < m:
+                        self.winning_combos.append(
+                            [(row + step_row * i) * m + column + step_column * i for i in range(k)])
+
+    def has_winner(self):
+        """
+        Return whether or not there is a winner.
+        """
+        board = self.board
+        for combo in self.winning_combos:
+            player = board[combo[0]]
+            if player is not None and all(board[i] == player for i in combo):
+                return True
+
+        return False